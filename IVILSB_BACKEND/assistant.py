@@ -1,6 +1,16 @@
 import openai
 import time
 import difflib
+from resilience import CircuitBreaker, HedgedCaller
+
+# ----------------------------------------------------------------
+# RESILIENCE
+
+REQUEST_TIMEOUT = 30        # Seconds before a single OpenAI API request is abandoned (never retried by the client)
+CALL_DEADLINE = 120         # Seconds before a full chat call (prompt, run and polling) is abandoned
+
+BREAKER = CircuitBreaker()  # Fails fast when the OpenAI API error rate is too high
+HEDGER = HedgedCaller()     # Starts a duplicate chat call when a run is slower than usual
 
 # ----------------------------------------------------------------
 # FUNCTIONS
@@ -14,6 +24,25 @@ def load_file(filepath):
         glossary_data = file.read()
     return glossary_data
 
+def load_dictionary(dict_path):
+    """
+    Load the LSB dictionary file as sorted word lists.
+
+    Args:
+        dict_path (str): Path to the LSB dictionary file.
+
+    Returns:
+        tuple: A tuple containing the dictionary list and the cleaned dictionary list.
+    """
+    glossary_data = load_file(dict_path)
+    # Replace line breaks with space and convert to lists
+    glossary_data = glossary_data.replace("\n", " ")
+    dictionary = glossary_data.split()
+    dictionary.sort()
+    clean_dictionary = (clean_text(glossary_data)).split()
+    clean_dictionary.sort()
+    return dictionary, clean_dictionary
+
 def clean_text(text):
     """
     Clean the input text by converting it to lowercase and removing punctuation.
@@ -72,7 +101,38 @@ def find_similar_word(dictionary, word):
     else:
         return None 
 
-def interpret(client, thread_id, assistant_id, instructions, dictionary, clean_dictionary, sentence, temperature, top_p):
+def dictionary_interpret(clean_dictionary, sentence):
+    """
+    Interpret a sentence locally, keeping only the words that are in the LSB dictionary.
+
+    This is the fallback used when the assistant is not available: each word is kept if it is
+    in the dictionary, replaced by the most similar dictionary word if there is a close one,
+    or dropped otherwise. The result is much less accurate than the assistant's, but immediate.
+
+    Args:
+        clean_dictionary (list): A cleaned list of valid words (lowercase, no punctuation).
+        sentence (str): The sentence to interpret.
+
+    Returns:
+        str: The interpreted sentence, ending with a period.
+    """
+    words = []
+    clean_sentence = clean_text(sentence)
+    for char in "?¿":
+        clean_sentence = clean_sentence.replace(char, " ")
+    for word in clean_sentence.replace(".", " . ").split():
+        # Keep the words accepted by the dictionary check
+        if len(check_sentence(clean_dictionary, [word])) == 0:
+            words.append(word)
+            continue
+        similar_words = difflib.get_close_matches(word, clean_dictionary, n=1, cutoff=0.85)
+        if similar_words:
+            words.append(similar_words[0])
+    if not words or words[-1] != ".":
+        words.append(".")
+    return " ".join(words)
+
+def interpret(client, thread_id, assistant_id, instructions, dictionary, clean_dictionary, sentence, temperature, top_p, stats=None):
     """
     Interpret a sentence using the assistant, ensuring all words comply with the provided dictionary.
     
@@ -85,7 +145,7 @@ def interpret(client, thread_id, assistant_id, instructions, dictionary, clean_d
 
     Args:
         client (openai.OpenAI): The OpenAI API client instance.
-        thread_id (str): The ID of the conversation thread.
+        thread_id (str or None): The ID of the conversation thread, or None to create it with the first prompt.
         assistant_id (str): The ID of the assistant to use.
         instructions (str): Instructions for the assistant.
         dictionary (list): A list of valid words.
@@ -93,10 +153,15 @@ def interpret(client, thread_id, assistant_id, instructions, dictionary, clean_d
         sentence (str): The sentence to interpret.
         temperature (float): Sampling temperature for the assistant's response.
         top_p (float): Nucleus sampling parameter for the assistant's response.
+        stats (dict, optional): Dictionary filled with the number of attempts, the number of unknown
+            words of each attempt and the token usage.
 
     Returns:
         str or None: The assistant's interpreted response if successful, otherwise None.
     """
+    if stats is not None:
+        stats.setdefault("attempts", 0)
+        stats.setdefault("unknown_words", [])
     correct = False  # Flag to check if the response complies with LSB
     intento = 1      # Number of attempts
     response = None  # Response from GPT
@@ -114,16 +179,19 @@ def interpret(client, thread_id, assistant_id, instructions, dictionary, clean_d
         print("| intento: ", intento, "|")
         print("|_____________|\n")
         intento += 1
+        if stats is not None:
+            stats["attempts"] += 1
 
         # Send the prompt to the assistant
-        response = chatWithGPT(
+        response, thread_id = resilientChatWithGPT(
             client=client, 
             thread_id=thread_id, 
             assistant_id=assistant_id, 
             instructions=instructions, 
             user_prompt=full_prompt, 
             temperature=temperature, 
-            top_p=top_p)
+            top_p=top_p,
+            stats=stats)
         if response:
             print("Response :", response)
             # Convert response to lists of words
@@ -131,6 +199,8 @@ def interpret(client, thread_id, assistant_id, instructions, dictionary, clean_d
             clean_response = (clean_text(response)).split()
             # Identify unknown words
             unknown_words = check_sentence(clean_dictionary, clean_response)
+            if stats is not None:
+                stats["unknown_words"].append(len(unknown_words))
             if len(unknown_words) == 0:
                 correct = True
             else:
@@ -193,6 +263,38 @@ def unclean_word(dictionary, clean_dictionary, clean_word):
 # ----------------------------------------------------------------
 # GPT FUNCTIONS
 
+def guardedRequest(request, **kwargs):
+    """
+    Send a single OpenAI API request through the circuit breaker.
+
+    The request fails fast when the breaker is open. Its outcome is recorded in the breaker:
+    an error answered by the API (e.g. unknown assistant ID) still counts as a success,
+    since the service is available.
+
+    Args:
+        request (callable): The client method to call.
+        **kwargs: The arguments of the request.
+
+    Returns:
+        The response of the request.
+
+    Raises:
+        RuntimeError: If the circuit breaker is open.
+        Exception: The error of the request.
+    """
+    if not BREAKER.allow():
+        raise RuntimeError("Circuit breaker open")
+    try:
+        response = request(**kwargs)
+    except openai.APIStatusError as e:
+        BREAKER.record(e.status_code < 500 and e.status_code != 429)
+        raise
+    except Exception:
+        BREAKER.record(False)
+        raise
+    BREAKER.record(True)
+    return response
+
 def createOrUpdateAssistant(asst_id, asst_name, llm_model, client, instructions):
     """
     Create a new assistant or update an existing one with the provided parameters.
@@ -208,7 +310,8 @@ def createOrUpdateAssistant(asst_id, asst_name, llm_model, client, instructions)
         str: The ID of the created or updated assistant.
     """
     try:
-        assistant = client.beta.assistants.update(
+        assistant = guardedRequest(
+            client.beta.assistants.update,
             assistant_id=asst_id,
             name=asst_name,
             model=llm_model,
@@ -218,7 +321,8 @@ def createOrUpdateAssistant(asst_id, asst_name, llm_model, client, instructions)
         return asst_id
     except Exception as e:
         print(f"Error updating assistant: {e}")
-        assistant = client.beta.assistants.create(
+        assistant = guardedRequest(
+            client.beta.assistants.create,
             name=asst_name,
             model=llm_model,
             instructions=instructions,
@@ -244,7 +348,62 @@ def createThread(client):
         print(f"Error creating thread: {e}")
         return None
 
-def chatWithGPT(client, thread_id, assistant_id, instructions, user_prompt, temperature, top_p):
+def resilientChatWithGPT(client, thread_id, assistant_id, instructions, user_prompt, temperature, top_p, stats=None):
+    """
+    Send a user prompt to the assistant with a deadline, hedging and a circuit breaker.
+
+    Execution:
+        - Fail fast if the circuit breaker is open.
+        - Send the prompt on the given thread, with a deadline of CALL_DEADLINE seconds.
+        - If the run is slower than the usual latency, send the same prompt on a new thread (hedged call)
+          and keep the first response.
+        - Record the outcome in the circuit breaker.
+
+    Args:
+        client (openai.OpenAI): The OpenAI API client instance.
+        thread_id (str or None): The ID of the conversation thread, or None to create it within the deadline.
+        assistant_id (str): The ID of the assistant to interact with.
+        instructions (str): Instructions for the assistant.
+        user_prompt (str): The user's prompt to send.
+        temperature (float): Sampling temperature for the assistant's response.
+        top_p (float): Nucleus sampling parameter for the assistant's response.
+        stats (dict, optional): Dictionary where the token usage of the runs is added.
+
+    Returns:
+        tuple: The assistant's response (or None) and the ID of the thread to use for the next prompts.
+    """
+    if not BREAKER.allow():
+        print("Circuit breaker open, skipping chat.")
+        return None, thread_id
+
+    threads = [thread_id, None]
+
+    def attempt(index, deadline, cancel_event):
+        if threads[index] is None:
+            # The first prompt creates the thread; a thread cannot have two active runs, the hedged call uses a new one
+            threads[index] = createThread(client)
+            if threads[index] is None:
+                return None
+        response = chatWithGPT(
+            client=client, 
+            thread_id=threads[index], 
+            assistant_id=assistant_id, 
+            instructions=instructions, 
+            user_prompt=user_prompt, 
+            temperature=temperature, 
+            top_p=top_p,
+            deadline=deadline,
+            cancel_event=cancel_event,
+            stats=stats)
+        return (response, threads[index]) if response else None
+
+    result = HEDGER.call(attempt, deadline=time.monotonic() + CALL_DEADLINE)
+    BREAKER.record(result is not None)
+    if result is None:
+        return None, thread_id
+    return result
+
+def chatWithGPT(client, thread_id, assistant_id, instructions, user_prompt, temperature, top_p, deadline=None, cancel_event=None, stats=None):
     """
     Send a user prompt to the assistant and retrieve the response.
 
@@ -256,6 +415,9 @@ def chatWithGPT(client, thread_id, assistant_id, instructions, user_prompt, temp
         user_prompt (str): The user's prompt to send.
         temperature (float): Sampling temperature for the assistant's response.
         top_p (float): Nucleus sampling parameter for the assistant's response.
+        deadline (float, optional): Time (from `time.monotonic`) after which the run is abandoned.
+        cancel_event (threading.Event, optional): Event set when the response is no longer needed.
+        stats (dict, optional): Dictionary where the token usage of the run is added.
 
     Returns:
         str or None: The assistant's response if successful, otherwise None.
@@ -277,12 +439,15 @@ def chatWithGPT(client, thread_id, assistant_id, instructions, user_prompt, temp
         return waitForRunCompletion(
             client=client, 
             thread_id=thread_id, 
-            run_id=run.id)
+            run_id=run.id,
+            deadline=deadline,
+            cancel_event=cancel_event,
+            stats=stats)
     except Exception as e:
         print(f"Error during chat: {e}")
         return None
 
-def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retries=15):
+def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retries=15, deadline=None, cancel_event=None, stats=None):
     """
     Wait for a run to complete and retrieve the response.
 
@@ -292,6 +457,9 @@ def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retrie
         run_id (str): The ID of the run to wait for.
         sleep_interval (int, optional): Seconds to wait between retries. Defaults to 5.
         max_retries (int, optional): Maximum number of retries. Defaults to 15.
+        deadline (float, optional): Time (from `time.monotonic`) after which the run is cancelled.
+        cancel_event (threading.Event, optional): Event set when the response is no longer needed.
+        stats (dict, optional): Dictionary where the token usage of the run is added.
 
     Returns:
         str or None: The assistant's response if the run completes successfully, otherwise None.
@@ -299,6 +467,10 @@ def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retrie
     retries = 0
 
     while retries < max_retries:
+        if (deadline is not None and time.monotonic() >= deadline) or (cancel_event is not None and cancel_event.is_set()):
+            print("Run no longer needed, cancelling it.")
+            cancelRun(client=client, thread_id=thread_id, run_id=run_id)
+            return None
         try:
             run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
             print(f"Run status: {run.status}")
@@ -309,6 +481,9 @@ def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retrie
                     "%H:%M:%S", time.gmtime(elapsed_time)
                 )
                 print(f"Run completed in {formatted_elapsed_time}")
+                if stats is not None and run.usage:
+                    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                        stats[key] = stats.get(key, 0) + getattr(run.usage, key, 0)
                 messages = client.beta.threads.messages.list(thread_id=thread_id)
                 if messages.data:
                     last_message = messages.data[-1]
@@ -317,6 +492,9 @@ def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retrie
                 else:
                     print("No messages found in the thread.")
                     return None
+            if run.status in ("failed", "cancelled", "expired", "incomplete"):
+                print(f"Run ended without completing: {run.status}")
+                return None
 
         except Exception as e:
             print(f"Error while retrieving the run: {e}")
@@ -324,11 +502,31 @@ def waitForRunCompletion(client, thread_id, run_id, sleep_interval=5, max_retrie
             print(f"Retry {retries}/{max_retries}")
 
         print(f"Waiting for run to complete... (Attempt {retries + 1}/{max_retries})")
-        time.sleep(sleep_interval)
+        wait_time = sleep_interval
+        if deadline is not None:
+            wait_time = max(0, min(wait_time, deadline - time.monotonic()))
+        if cancel_event is not None:
+            cancel_event.wait(wait_time)
+        else:
+            time.sleep(wait_time)
     
     print("Max retries reached. Exiting wait loop.")
     return None
 
+def cancelRun(client, thread_id, run_id):
+    """
+    Cancel a run that is no longer needed.
+
+    Args:
+        client (openai.OpenAI): The OpenAI API client instance.
+        thread_id (str): The ID of the conversation thread.
+        run_id (str): The ID of the run to cancel.
+    """
+    try:
+        client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except Exception as e:
+        print(f"Error cancelling the run: {e}")
+
 # ----------------------------------------------------------------
 # MAIN EXECUTION
 
@@ -336,6 +534,10 @@ def asst_init(dict_path, inst_path, asst_id, asst_name, llm_model):
     """
     Initialize the assistant by loading necessary data and setting up the assistant.
 
+    This sends requests to the OpenAI API, so it should be called once and its result reused
+    for all the sentences. The client does not retry the requests: the deadlines and the
+    circuit breaker handle the failures.
+
     Args:
         dict_path (str): Path to the LSB dictionary file.
         inst_path (str): Path to the assistant instructions file.
@@ -345,21 +547,18 @@ def asst_init(dict_path, inst_path, asst_id, asst_name, llm_model):
 
     Returns:
         tuple: A tuple containing the OpenAI client, assistant ID, instructions, dictionary list, and cleaned dictionary list.
+
+    Raises:
+        RuntimeError: If the circuit breaker is open.
+        Exception: The error of the OpenAI API if the assistant could not be created.
     """
     print("\n-------------------------------")
     print("INITIATION\n")
-    client = openai.OpenAI()
+    client = openai.OpenAI(timeout=REQUEST_TIMEOUT, max_retries=0)
 
     # Load glossary data and instructions
-    glossary_data = load_file(dict_path)
+    dictionary, clean_dictionary = load_dictionary(dict_path)
     instructions = load_file(inst_path)
-
-    # Replace line breaks with space and convert to lists
-    glossary_data = glossary_data.replace("\n", " ")
-    dictionary = glossary_data.split()
-    dictionary.sort()
-    clean_dictionary = (clean_text(glossary_data)).split()
-    clean_dictionary.sort()
     print("Dictionary loaded with", len(clean_dictionary), "words")
 
     # Create or update the assistant with instructions
@@ -373,7 +572,7 @@ def asst_init(dict_path, inst_path, asst_id, asst_name, llm_model):
     print("\n-------------------------------\n")
     return (client, assistant_id, instructions, dictionary, clean_dictionary)
 
-def asst_main(client, assistant_id, instructions, dictionary, clean_dictionary, sentence, T, P):
+def asst_main(client, assistant_id, instructions, dictionary, clean_dictionary, sentence, T, P, stats=None):
     """
     Main function to interpret a sentence using the assistant.
 
@@ -386,77 +585,29 @@ def asst_main(client, assistant_id, instructions, dictionary, clean_dictionary,
         sentence (str): The sentence to interpret.
         T (float): Sampling temperature for the assistant's response.
         P (float): Nucleus sampling parameter for the assistant's response.
+        stats (dict, optional): Dictionary filled with the number of attempts, the number of unknown
+            words of each attempt and the token usage.
 
     Returns:
         str or None: The interpreted sentence from the assistant if successful, otherwise None.
     """
-    # Create a new thread
-    thread_id = createThread(client)
-
     print("\n-------------------------------")
     print("INTERPRETATION")
 
-    # Interpret the sentence
+    # Interpret the sentence, the thread is created with the first prompt
     result = interpret(
         client=client, 
-        thread_id=thread_id, 
+        thread_id=None, 
         assistant_id=assistant_id, 
         instructions=instructions, 
         dictionary=dictionary, 
         clean_dictionary=clean_dictionary, 
         sentence=sentence,
         temperature=T,
-        top_p=P
+        top_p=P,
+        stats=stats
         )
     
     print("\n-------------------------------\n")
     
     return result
-
-if __name__ == "__main__":
-    """
-    Entry point of the script. Initializes the assistant and processes a sample sentence multiple times,
-    writing the results to a specified file.
-    """
-
-    # Constants
-    INSTRUCTIONS = "data/instructions.txt"
-    DICTIONARY = "data/LSB_v5.txt"
-    RESULTS = "results/results.txt"
-
-    # OpenAI API client config
-    ASST_ID = "asst_n6lhbk01aFIQst5Jmg2pjoAG"
-    ASST_NAME = "IVI_LSB"
-    LLM_MODEL = "gpt-4o-2024-08-06"
-
-    # Thread config
-    LLM_TEMPERATURE = 0.2
-    LLM_TOP_P = 0.9
-    
-    sentence = "Hola, soy IVILSB!"
-    
-    # Initialize the assistant
-    client, assistant_id, instructions, dictionary, clean_dictionary = asst_init(
-        dict_path=DICTIONARY, 
-        inst_path=INSTRUCTIONS, 
-        asst_id=ASST_ID, 
-        asst_name=ASST_NAME, 
-        llm_model=LLM_MODEL)
-
-    with open(RESULTS, "w", encoding="utf-8") as file:
-        for k in range(3):
-            result = asst_main(
-                client=client, 
-                assistant_id=assistant_id, 
-                instructions=instructions, 
-                dictionary=dictionary, 
-                clean_dictionary=clean_dictionary, 
-                sentence=sentence,
-                T=LLM_TEMPERATURE,
-                P=LLM_TOP_P
-                )
-            if result:
-                file.write(result + "\n")
-            else:
-                file.write("ERROR.\n")
-        file.write("\n")
@@ -0,0 +1,264 @@
+import difflib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+# ----------------------------------------------------------------
+# CONSTANTS
+
+# Words that change the meaning of a sentence: a near match must have exactly the same ones
+NEGATION_WORDS = {"no", "nunca", "jamas", "ni", "nada", "nadie", "ningun", "ninguno", "ninguna", "tampoco", "sin"}
+
+# Function words that can differ between two near matches
+STOP_WORDS = {
+    "el", "la", "los", "las", "lo", "un", "una", "unos", "unas", "al", "del",
+    "a", "de", "en", "con", "por", "para", "y", "e", "o", "u", "que",
+    "me", "te", "se", "le", "les", "nos", "mi", "mis", "tu", "tus", "su", "sus"
+}
+
+WORD_SIMILARITY = 0.8       # Minimum similarity of two matching content words (small spelling differences)
+
+# ----------------------------------------------------------------
+# FUNCTIONS
+
+def normalize_sentence(sentence):
+    """
+    Normalize a sentence so that small spelling differences map to the same text.
+
+    This function :
+    - Lowers the case of the text
+    - Replaces accented characters
+    - Removes punctuation
+    - Collapses whitespace
+
+    Args:
+        sentence (str): The sentence to normalize.
+
+    Returns:
+        str: The normalized sentence.
+    """
+    res = sentence.lower()
+    for chars, replacement in (("áàäâã", "a"), ("éèëê", "e"), ("íìïî", "i"), ("óòöôõ", "o"), ("úùüû", "u"), ("ñ", "n")):
+        for char in chars:
+            res = res.replace(char, replacement)
+    for char in "?¿,;:!¡()[]{}.\"'-":
+        res = res.replace(char, " ")
+    return " ".join(res.split())
+
+def is_single_sentence(sentence):
+    """
+    Check that a text contains at most one sentence (no period, question or exclamation mark
+    before its final punctuation).
+
+    Args:
+        sentence (str): The raw text.
+
+    Returns:
+        bool: True if the text is a single sentence.
+    """
+    return re.search(r'[.!?]', sentence.strip().rstrip('.!? ')) is None
+
+def content_words(text):
+    """
+    Split a normalized text into its content words and its negation words.
+
+    Args:
+        text (str): The normalized text.
+
+    Returns:
+        tuple: The list of content words and the list of negation words, in order.
+    """
+    words = text.split()
+    return ([word for word in words if word not in STOP_WORDS and word not in NEGATION_WORDS],
+            [word for word in words if word in NEGATION_WORDS])
+
+def same_meaning(text, other):
+    """
+    Check that two similar normalized texts can share their interpretation: they must have the same
+    negation words and the same content words in the same order (up to small spelling differences).
+
+    Args:
+        text (str): The normalized text.
+        other (str): The normalized text of the near match.
+
+    Returns:
+        bool: True if the interpretation of `other` can be reused for `text`.
+    """
+    words, negations = content_words(text)
+    other_words, other_negations = content_words(other)
+    if negations != other_negations or len(words) != len(other_words):
+        return False
+    return all(word == other_word or difflib.SequenceMatcher(None, word, other_word).ratio() >= WORD_SIMILARITY
+               for word, other_word in zip(words, other_words))
+
+def char_ngrams(text, n=3):
+    """
+    Count the character n-grams of a normalized text, padded with spaces.
+
+    Args:
+        text (str): The normalized text.
+        n (int, optional): Length of the n-grams. Defaults to 3.
+
+    Returns:
+        Counter: The frequency of each n-gram.
+    """
+    padded = " " + text + " "
+    return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+# ----------------------------------------------------------------
+# SEMANTIC CACHE
+
+class SemanticCache:
+    """
+    In-memory cache of interpreted sentences that also matches near-duplicate sentences.
+
+    Sentences are normalized and embedded as TF-IDF vectors of character n-grams.
+    A lookup first tries the exact normalized sentence, then, for a single sentence only,
+    the most similar stored sentence through an inverted index of n-grams. Near matches
+    above the similarity threshold are returned only if they have the same negation and
+    content words (see `same_meaning`) and pass the validation function.
+    The cache keeps at most `max_size` sentences and evicts the least recently used.
+    """
+
+    def __init__(self, max_size=2048, threshold=0.9, ngram=3, candidates=5):
+        """
+        Args:
+            max_size (int, optional): Maximum number of stored sentences. Defaults to 2048.
+            threshold (float, optional): Minimum cosine similarity of a near match. Defaults to 0.9.
+            ngram (int, optional): Length of the character n-grams. Defaults to 3.
+            candidates (int, optional): Number of best candidates scored exactly. Defaults to 5.
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ngram = ngram
+        self.candidates = candidates
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()        # normalized sentence -> (n-grams, result)
+        self.postings = defaultdict(set)    # n-gram -> normalized sentences
+        self.stats = Counter()
+        self.similarities = []
+
+    def lookup(self, sentence, validate=None):
+        """
+        Retrieve the stored result of the same or a similar sentence.
+
+        Args:
+            sentence (str): The sentence to look up.
+            validate (callable, optional): Function called as `validate(result)` that returns
+                True if a near match can still be used (e.g. all its words are in the dictionary).
+
+        Returns:
+            str or None: The stored result, or None if there is no usable match.
+        """
+        key = normalize_sentence(sentence)
+        with self.lock:
+            self.stats["lookups"] += 1
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return self.entries[key][1]
+            match, similarity = self._nearest(key) if is_single_sentence(sentence) else (None, 0.0)
+            if match is None:
+                self.stats["misses"] += 1
+                return None
+            result = self.entries[match][1]
+        if validate is not None and not validate(result):
+            with self.lock:
+                self.stats["rejected"] += 1
+                self.stats["misses"] += 1
+            return None
+        with self.lock:
+            if match in self.entries:
+                self.entries.move_to_end(match)
+            self.stats["near_hits"] += 1
+            self.similarities.append(similarity)
+            # Keep a bounded window of recent similarities for the metrics
+            if len(self.similarities) > self.max_size:
+                del self.similarities[:len(self.similarities) - self.max_size]
+        print(f"Cache near hit ({similarity:.2f}): '{sentence}' -> '{match}'")
+        return result
+
+    def store(self, sentence, result):
+        """
+        Store the result of a sentence, evicting the least recently used sentences if needed.
+
+        Args:
+            sentence (str): The interpreted sentence.
+            result (str): The result of the interpretation.
+        """
+        if result is None:
+            return
+        key = normalize_sentence(sentence)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            grams = char_ngrams(key, self.ngram)
+            self.entries[key] = (grams, result)
+            for gram in grams:
+                self.postings[gram].add(key)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.stats["evictions"] += 1
+
+    def metrics(self):
+        """
+        Return the usage and hit-quality metrics of the cache.
+
+        Returns:
+            dict: Counters, hit rate and similarity statistics of the near hits.
+        """
+        with self.lock:
+            lookups = self.stats["lookups"]
+            hits = self.stats["exact_hits"] + self.stats["near_hits"]
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "lookups": lookups,
+                "exact_hits": self.stats["exact_hits"],
+                "near_hits": self.stats["near_hits"],
+                "misses": self.stats["misses"],
+                "rejected": self.stats["rejected"],
+                "mismatched": self.stats["mismatched"],
+                "evictions": self.stats["evictions"],
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "near_similarity_mean": sum(self.similarities) / len(self.similarities) if self.similarities else None,
+                "near_similarity_min": min(self.similarities) if self.similarities else None
+            }
+
+    def _idf(self, gram):
+        return math.log((1 + len(self.entries)) / (1 + len(self.postings.get(gram, ())))) + 1
+
+    def _nearest(self, key):
+        # Rank the stored sentences sharing n-grams with the query by their dot product
+        query = char_ngrams(key, self.ngram)
+        weights = {gram: count * self._idf(gram) for gram, count in query.items()}
+        scores = Counter()
+        for gram, weight in weights.items():
+            for other in self.postings.get(gram, ()):
+                scores[other] += weight * self.entries[other][0][gram] * self._idf(gram)
+        if not scores:
+            return None, 0.0
+        # Compute the exact cosine similarity of the best candidates only
+        query_norm = math.sqrt(sum(w * w for w in weights.values()))
+        best, best_similarity = None, 0.0
+        for other, dot in scores.most_common(self.candidates):
+            grams = self.entries[other][0]
+            norm = math.sqrt(sum((count * self._idf(gram)) ** 2 for gram, count in grams.items()))
+            similarity = dot / (query_norm * norm)
+            if similarity < self.threshold or similarity <= best_similarity:
+                continue
+            # Similar spelling is not enough: a different negation or content word changes the meaning
+            if not same_meaning(key, other):
+                self.stats["mismatched"] += 1
+                continue
+            best, best_similarity = other, similarity
+        return best, best_similarity
+
+    def _remove(self, key):
+        grams, _ = self.entries.pop(key)
+        for gram in grams:
+            self.postings[gram].discard(key)
+            if not self.postings[gram]:
+                del self.postings[gram]
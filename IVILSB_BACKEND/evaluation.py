@@ -0,0 +1,309 @@
+import argparse
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from assistant import asst_init, asst_main, load_dictionary, check_sentence, clean_text, dictionary_interpret
+
+# ----------------------------------------------------------------
+# CONSTANTS
+
+INSTRUCTIONS = "data/instructions.txt"
+DICTIONARY = "data/LSB_v5.txt"
+CORPUS = "data/eval_corpus.txt"
+REPORT = "results/report.json"
+
+# OpenAI API client config
+ASST_ID = "asst_n6lhbk01aFIQst5Jmg2pjoAG"
+ASST_NAME = "IVI_LSB"
+LLM_MODEL = "o1-mini-2024-09-12"
+
+# Thread config
+LLM_TEMPERATURE = 0.2
+LLM_TOP_P = 0.9
+
+PERCENTILES = (50, 90, 95, 99)
+
+# ----------------------------------------------------------------
+# BACKENDS
+#
+# A backend is a function called as `backend(sentence, stats)` that returns the
+# interpreted sentence (or None) and fills `stats` with "attempts", "unknown_words"
+# and token usage when it knows them.
+
+def assistant_backend(model=LLM_MODEL):
+    """
+    Create a backend that interprets the sentences with the OpenAI assistant.
+
+    Args:
+        model (str, optional): The language model to use. Defaults to LLM_MODEL.
+
+    Returns:
+        callable: The backend function.
+    """
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv())
+
+    client, assistant_id, instructions, dictionary, clean_dictionary = asst_init(
+        dict_path=DICTIONARY,
+        inst_path=INSTRUCTIONS,
+        asst_id=ASST_ID,
+        asst_name=ASST_NAME,
+        llm_model=model)
+
+    def backend(sentence, stats):
+        return asst_main(
+            client=client,
+            assistant_id=assistant_id,
+            instructions=instructions,
+            dictionary=dictionary,
+            clean_dictionary=clean_dictionary,
+            sentence=sentence,
+            T=LLM_TEMPERATURE,
+            P=LLM_TOP_P,
+            stats=stats)
+    return backend
+
+def mock_backend(model=None):
+    """
+    Create a backend that interprets the sentences locally with the dictionary only.
+
+    It does not call any external service, so the harness can be tested offline.
+
+    Args:
+        model (str, optional): Ignored.
+
+    Returns:
+        callable: The backend function.
+    """
+    _, clean_dictionary = load_dictionary(DICTIONARY)
+
+    def backend(sentence, stats):
+        stats["attempts"] = 1
+        return dictionary_interpret(clean_dictionary, sentence)
+    return backend
+
+BACKENDS = {
+    "assistant": assistant_backend,
+    "mock": mock_backend
+}
+
+def load_backend(name, model=LLM_MODEL):
+    """
+    Create a backend from its name, or from a "module:function" factory path.
+
+    Args:
+        name (str): "assistant", "mock" or "module:function".
+        model (str, optional): The language model passed to the factory.
+
+    Returns:
+        callable: The backend function.
+    """
+    if name in BACKENDS:
+        return BACKENDS[name](model=model)
+    module_name, _, function_name = name.partition(":")
+    factory = getattr(importlib.import_module(module_name), function_name)
+    return factory(model=model)
+
+# ----------------------------------------------------------------
+# EVALUATION
+
+def load_corpus(corpus_path):
+    """
+    Load the evaluation corpus: one Spanish sentence per line, ignoring empty lines and lines starting with "#".
+
+    Args:
+        corpus_path (str): Path to the corpus file.
+
+    Returns:
+        list: The list of sentences.
+    """
+    with open(corpus_path, 'r', encoding='utf-8') as file:
+        lines = [line.strip() for line in file]
+    return [line for line in lines if line and not line.startswith("#")]
+
+def evaluate_sentence(backend, clean_dictionary, sentence):
+    """
+    Interpret one sentence with the backend and measure it.
+
+    Args:
+        backend (callable): The backend function.
+        clean_dictionary (list): A cleaned list of valid words.
+        sentence (str): The sentence to interpret.
+
+    Returns:
+        dict: The result, validity, attempts, unknown-word counts, latency and token usage of the sentence.
+    """
+    stats = {}
+    error = None
+    start = time.perf_counter()
+    try:
+        result = backend(sentence, stats)
+    except Exception as e:
+        result = None
+        error = str(e)
+    latency = time.perf_counter() - start
+    final_unknown = check_sentence(clean_dictionary, clean_text(result).split()) if result else None
+    return {
+        "sentence": sentence,
+        "result": result,
+        "valid": result is not None and len(final_unknown) == 0,
+        "attempts": stats.get("attempts", 0),
+        "unknown_words": stats.get("unknown_words", []),
+        "final_unknown_words": final_unknown,
+        "latency": latency,
+        "prompt_tokens": stats.get("prompt_tokens", 0),
+        "completion_tokens": stats.get("completion_tokens", 0),
+        "total_tokens": stats.get("total_tokens", 0),
+        "error": error
+    }
+
+def percentile(values, p):
+    """
+    Compute a percentile with the nearest-rank method.
+
+    Args:
+        values (list): The values.
+        p (float): The percentile, between 0 and 100.
+
+    Returns:
+        float or None: The percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, -(-len(ordered) * p // 100) - 1))
+    return ordered[int(index)]
+
+def summarize(records, wall_time):
+    """
+    Aggregate the records of an evaluation run.
+
+    Args:
+        records (list): The records returned by `evaluate_sentence`.
+        wall_time (float): Total duration of the run in seconds.
+
+    Returns:
+        dict: The aggregated speed and accuracy metrics.
+    """
+    count = len(records)
+    latencies = [record["latency"] for record in records]
+    summary = {
+        "sentences": count,
+        "valid_rate": sum(record["valid"] for record in records) / count if count else 0.0,
+        "errors": sum(record["error"] is not None for record in records),
+        "attempts_mean": sum(record["attempts"] for record in records) / count if count else 0.0,
+        "unknown_words_mean": sum(sum(record["unknown_words"]) for record in records) / count if count else 0.0,
+        "latency_mean": sum(latencies) / count if count else None,
+        "latency_max": max(latencies) if latencies else None,
+        "total_tokens": sum(record["total_tokens"] for record in records),
+        "tokens_mean": sum(record["total_tokens"] for record in records) / count if count else 0.0,
+        "wall_time": wall_time,
+        "throughput": count / wall_time if wall_time > 0 else None
+    }
+    for p in PERCENTILES:
+        summary[f"latency_p{p}"] = percentile(latencies, p)
+    return summary
+
+def compare_reports(previous, current):
+    """
+    Compare an evaluation report with a previous one.
+
+    Args:
+        previous (dict): The previous report.
+        current (dict): The current report.
+
+    Returns:
+        dict: The change of each summary metric, and the sentences whose validity or result changed.
+    """
+    summary = {}
+    for key, value in current["summary"].items():
+        old = previous.get("summary", {}).get(key)
+        if isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            summary[key] = {"previous": old, "current": value, "change": value - old}
+    previous_records = {record["sentence"]: record for record in previous.get("records", [])}
+    sentences = []
+    for record in current["records"]:
+        old = previous_records.get(record["sentence"])
+        if old is None:
+            continue
+        if old["valid"] != record["valid"] or old["result"] != record["result"]:
+            sentences.append({
+                "sentence": record["sentence"],
+                "previous": {"result": old["result"], "valid": old["valid"]},
+                "current": {"result": record["result"], "valid": record["valid"]}
+            })
+    return {"summary": summary, "sentences": sentences}
+
+def main_evaluation(corpus_path=CORPUS, backend_name="mock", workers=4, report_path=REPORT, baseline_path=None, model=LLM_MODEL):
+    """
+    Evaluate a backend on a corpus and write a JSON report.
+
+    Args:
+        corpus_path (str, optional): Path to the corpus file. Defaults to CORPUS.
+        backend_name (str, optional): "assistant", "mock" or "module:function". Defaults to "mock".
+        workers (int, optional): Number of sentences interpreted concurrently. Defaults to 4.
+        report_path (str, optional): Path of the JSON report. Defaults to REPORT.
+        baseline_path (str, optional): Path of a previous report to compare with.
+        model (str, optional): The language model used by the assistant backend.
+
+    Returns:
+        dict: The report.
+    """
+    sentences = load_corpus(corpus_path)
+    _, clean_dictionary = load_dictionary(DICTIONARY)
+    backend = load_backend(backend_name, model=model)
+    print(f"Evaluating {len(sentences)} sentences with the '{backend_name}' backend ({workers} workers)")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        records = list(executor.map(lambda sentence: evaluate_sentence(backend, clean_dictionary, sentence), sentences))
+    wall_time = time.perf_counter() - start
+
+    report = {
+        "backend": backend_name,
+        "model": model if backend_name == "assistant" else None,
+        "corpus": corpus_path,
+        "dictionary": DICTIONARY,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": summarize(records, wall_time),
+        "records": records
+    }
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as file:
+            report["diff"] = compare_reports(json.load(file), report)
+
+    directory = os.path.dirname(report_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=4, ensure_ascii=False)
+
+    print(json.dumps(report["summary"], indent=4))
+    print(f"Report saved to {report_path}")
+    return report
+
+if __name__ == "__main__":
+    """
+    Entry point of the script. Evaluates a backend on a corpus of Spanish sentences.
+    Example:
+        python evaluation.py --backend assistant --workers 8 --baseline results/previous.json
+    """
+    arg_parser = argparse.ArgumentParser(description="Evaluate the speed and accuracy of the LSB interpretation.")
+    arg_parser.add_argument("--corpus", default=CORPUS, help="Corpus file, one sentence per line")
+    arg_parser.add_argument("--backend", default="mock", help="'assistant', 'mock' or 'module:function'")
+    arg_parser.add_argument("--workers", type=int, default=4, help="Number of concurrent sentences")
+    arg_parser.add_argument("--output", default=REPORT, help="Path of the JSON report")
+    arg_parser.add_argument("--baseline", default=None, help="Previous JSON report to compare with")
+    arg_parser.add_argument("--model", default=LLM_MODEL, help="Language model of the assistant backend")
+    args = arg_parser.parse_args()
+
+    main_evaluation(
+        corpus_path=args.corpus,
+        backend_name=args.backend,
+        workers=args.workers,
+        report_path=args.output,
+        baseline_path=args.baseline,
+        model=args.model)
@@ -0,0 +1,278 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# ----------------------------------------------------------------
+# CONSTANTS
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+# ----------------------------------------------------------------
+# JOB STORE
+
+class JobStore:
+    """
+    Small SQLite store that keeps the state and results of the translation jobs.
+
+    Every change is committed immediately, so completed jobs survive a server restart.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the job database.
+
+        Args:
+            path (str): Path to the SQLite file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, "
+                "status TEXT NOT NULL, "
+                "text TEXT NOT NULL, "
+                "words TEXT NOT NULL, "
+                "callback_url TEXT, "
+                "result TEXT, "
+                "error TEXT, "
+                "created_at REAL NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def create(self, text, words, callback_url=None):
+        """
+        Insert a new queued job.
+
+        Args:
+            text (str): The text to be interpreted.
+            words (list): The list of available words sent by the client.
+            callback_url (str, optional): URL notified when the job finishes.
+
+        Returns:
+            str: The ID of the new job.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO jobs (id, status, text, words, callback_url, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, text, json.dumps(words), callback_url, now, now)
+            )
+        return job_id
+
+    def update(self, job_id, status, result=None, error=None):
+        """
+        Update the status of a job, and its result or error if given.
+
+        Args:
+            job_id (str): The ID of the job.
+            status (str): The new status of the job.
+            result (list, optional): The processed text of the job.
+            error (str, optional): The error message if the job failed.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        """
+        Retrieve a job.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            dict or None: The job data, or None if the job does not exist.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def unfinished(self):
+        """
+        Retrieve the jobs that were queued or running, oldest first.
+
+        Returns:
+            list: A list of job dictionaries.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def _to_dict(self, row):
+        job = dict(row)
+        job["words"] = json.loads(job["words"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+# ----------------------------------------------------------------
+# JOB MANAGER
+
+class JobManager:
+    """
+    Run translation jobs in a bounded pool of background workers.
+
+    The number of jobs waiting or running at the same time is limited by `max_pending`,
+    so a burst of long texts cannot pile up unbounded work on the server.
+    """
+
+    def __init__(self, store, process, max_workers=2, max_pending=32, callback_url=None):
+        """
+        Args:
+            store (JobStore): The store where the jobs are persisted.
+            process (callable): Function called as `process(text, words)` that returns the processed text.
+            max_workers (int, optional): Number of background workers. Defaults to 2.
+            max_pending (int, optional): Maximum number of queued or running jobs. Defaults to 32.
+            callback_url (str, optional): Local URL notified when a job finishes. It is configured by the
+                server only: the clients cannot choose where the results are sent.
+
+        Raises:
+            ValueError: If the callback URL is not a local HTTP URL.
+        """
+        if callback_url and not is_local_url(callback_url):
+            raise ValueError(f"Callback URL must be a local HTTP URL: {callback_url}")
+        self.store = store
+        self.process = process
+        self.callback_url = callback_url
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ivilsb-job")
+
+    def submit(self, text, words):
+        """
+        Queue a new job.
+
+        Args:
+            text (str): The text to be interpreted.
+            words (list): The list of available words sent by the client.
+
+        Returns:
+            str or None: The ID of the job, or None if the queue is full.
+        """
+        if not self.slots.acquire(blocking=False):
+            print("Job queue is full.")
+            return None
+        job_id = self.store.create(text, words, self.callback_url)
+        self.executor.submit(self._run, job_id)
+        print(f"Job {job_id} queued")
+        return job_id
+
+    def get(self, job_id):
+        """
+        Retrieve the public state of a job.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            dict or None: The job status, processed text and error, or None if the job does not exist.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "processed_text": job["result"],
+            "error": job["error"]
+        }
+
+    def resume(self):
+        """
+        Queue again the jobs that were interrupted by a server restart.
+
+        The jobs are queued in the background, oldest first, as the slots become free,
+        so they never exceed `max_pending` and none of them is left queued forever.
+
+        Returns:
+            int: The number of resumed jobs.
+        """
+        job_ids = [job["id"] for job in self.store.unfinished()]
+        if job_ids:
+            print(f"{len(job_ids)} unfinished jobs resumed")
+            threading.Thread(target=self._resume, args=(job_ids,), name="ivilsb-job-resume", daemon=True).start()
+        return len(job_ids)
+
+    def _resume(self, job_ids):
+        for job_id in job_ids:
+            # Wait for a free slot; the running jobs release theirs when they finish
+            self.slots.acquire()
+            self.store.update(job_id, STATUS_QUEUED)
+            self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            job = self.store.get(job_id)
+            self.store.update(job_id, STATUS_RUNNING)
+            try:
+                result = self.process(job["text"], job["words"])
+                self.store.update(job_id, STATUS_DONE, result=result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self.store.update(job_id, STATUS_FAILED, error=str(e))
+            if self.callback_url:
+                notify_callback(self.callback_url, self.get(job_id))
+        finally:
+            self.slots.release()
+
+# ----------------------------------------------------------------
+# CALLBACKS
+
+def is_local_url(url):
+    """
+    Check that a URL is an HTTP(S) URL pointing to the local machine.
+
+    Args:
+        url (str): The URL to check.
+
+    Returns:
+        bool: True if the URL is a local HTTP(S) URL.
+    """
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and parsed.hostname in LOCAL_HOSTS
+
+def notify_callback(url, payload, timeout=5):
+    """
+    Send the final state of a job to its callback URL as a JSON POST request.
+
+    Args:
+        url (str): The callback URL.
+        payload (dict): The job state to send.
+        timeout (int, optional): Seconds to wait for the callback. Defaults to 5.
+
+    Returns:
+        bool: True if the callback answered successfully.
+    """
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return 200 <= response.status < 300
+    except Exception as e:
+        print(f"Error sending callback to {url}: {e}")
+        return False
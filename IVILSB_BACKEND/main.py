@@ -4,6 +4,7 @@
 from dotenv import load_dotenv, find_dotenv
 import openai
 import os
+import threading
 
 # Constants
 INSTRUCTIONS = "data/instructions.txt"
@@ -18,14 +19,70 @@ LLM_MODEL = "o1-mini-2024-09-12"            # Language model to use
 LLM_TEMPERATURE = 0.2                       # Temperature for the language model
 LLM_TOP_P = 0.9                             # Top-p parameter for the language model
 
+# Job config
+JOBS_DATABASE = "data/jobs.sqlite3"         # Local store for the job results
+JOB_WORKERS = 2                             # Number of background workers
+JOB_MAX_PENDING = 32                        # Maximum number of queued or running jobs
+
+# Cache config
+CACHE_SIZE = 2048                           # Maximum number of cached sentences
+CACHE_THRESHOLD = 0.9                       # Minimum similarity to reuse a cached sentence
+
 # Load environment variables
 _ = load_dotenv(find_dotenv())
 openai.api_key = os.environ.get("OPENAI_API_KEY")
+JOB_CALLBACK_URL = os.environ.get("JOB_CALLBACK_URL")   # Local URL notified when a job finishes (server-configured only)
 
 # -------------------------------------------------------
 # FUNCTIONS
 
-from assistant import asst_init, asst_main
+from assistant import asst_init, asst_main, load_dictionary, check_sentence, clean_text, dictionary_interpret, BREAKER, HEDGER
+from cache import SemanticCache
+from session import split_sentences
+
+# Cache of interpreted sentences, shared by all the endpoints
+_, CLEAN_DICTIONARY = load_dictionary(DICTIONARY)
+sentence_cache = SemanticCache(max_size=CACHE_SIZE, threshold=CACHE_THRESHOLD)
+
+# Assistant shared by all the requests, initialized on first use
+assistant_lock = threading.Lock()
+assistant_state = None
+
+def get_assistant():
+    """
+    Initialize the assistant once and reuse it for all the requests.
+
+    The initialization goes through the circuit breaker; if it fails, it is tried again
+    on a later request.
+
+    Returns:
+        tuple or None: The result of `asst_init`, or None if the assistant is not available.
+    """
+    global assistant_state
+    with assistant_lock:
+        if assistant_state is None:
+            try:
+                assistant_state = asst_init(
+                    dict_path=DICTIONARY, 
+                    inst_path=INSTRUCTIONS, 
+                    asst_id=ASST_ID, 
+                    asst_name=ASST_NAME, 
+                    llm_model=LLM_MODEL)
+            except Exception as e:
+                print(f"Error initializing the assistant: {e}")
+        return assistant_state
+
+def is_valid_result(result):
+    """
+    Check that an interpreted sentence only uses words of the LSB dictionary.
+
+    Args:
+        result (str): The interpreted sentence.
+
+    Returns:
+        bool: True if every word is in the dictionary.
+    """
+    return len(check_sentence(CLEAN_DICTIONARY, clean_text(result).split())) == 0
 
 def prepare_text(text):
     """
@@ -71,12 +128,56 @@ def prepare_text(text):
     res = res.split(" ")
     return res
 
+def interpret_sentence(sentence):
+    """
+    Interpret a single sentence, reusing the interpretation of the same or a similar cached sentence.
+
+    If there is no usable cached interpretation, the sentence is sent to the assistant (initialized
+    once, see `get_assistant`) and its response is cached. If the assistant is unavailable (circuit
+    breaker open or no response), the sentence is interpreted with the dictionary only.
+
+    Args:
+        sentence (str): The sentence to interpret.
+
+    Returns:
+        str: The interpreted sentence.
+    """
+    # Reuse the interpretation of the same or a similar sentence
+    result = sentence_cache.lookup(sentence, validate=is_valid_result)
+
+    assistant = get_assistant() if result is None and not BREAKER.is_open() else None
+    if assistant is not None:
+        client, assistant_id, instructions, dictionary, clean_dictionary = assistant
+        try:
+            # Interpret the sentence using the assistant, every request goes through the deadline and the breaker
+            result = asst_main(
+                client=client, 
+                assistant_id=assistant_id, 
+                instructions=instructions, 
+                dictionary=dictionary, 
+                clean_dictionary=clean_dictionary, 
+                sentence=sentence,
+                T=LLM_TEMPERATURE,
+                P=LLM_TOP_P
+            )
+        except Exception as e:
+            print(f"Error during interpretation: {e}")
+            result = None
+        sentence_cache.store(sentence, result)
+
+    if result is None:
+        # Fall back to the dictionary-only interpretation
+        print("Assistant unavailable, interpreting with the dictionary only.")
+        result = dictionary_interpret(CLEAN_DICTIONARY, sentence)
+    return result
+
 def main_process(input_text, words):
     """
     Process the input text by interpreting it using the assistant and preparing the response.
 
-    This function initializes the assistant, sends the input text for interpretation, receives the
-    response, and then prepares the text by normalizing it.
+    The text is split into sentences and each sentence is interpreted separately (see
+    `interpret_sentence`), so the cache is keyed by sentence: editing one sentence of a long
+    text only interprets that sentence again. The response is then prepared by normalizing it.
 
     Args:
         input_text (str): The text input to be processed and interpreted.
@@ -87,26 +188,9 @@ def main_process(input_text, words):
     """
     print("text", input_text)
     print("words", words)
-    
-    # Initialize the assistant
-    client, assistant_id, instructions, dictionary, clean_dictionary = asst_init(
-        dict_path=DICTIONARY, 
-        inst_path=INSTRUCTIONS, 
-        asst_id=ASST_ID, 
-        asst_name=ASST_NAME, 
-        llm_model=LLM_MODEL)
-
-    # Interpret the sentence using the assistant
-    result = asst_main(
-        client=client, 
-        assistant_id=assistant_id, 
-        instructions=instructions, 
-        dictionary=dictionary, 
-        clean_dictionary=clean_dictionary, 
-        sentence=input_text,
-        T=LLM_TEMPERATURE,
-        P=LLM_TOP_P
-    )
+
+    sentences = split_sentences(input_text) or [input_text]
+    result = " ".join(interpret_sentence(sentence) for sentence in sentences)
     
     print(result)
 
@@ -121,8 +205,12 @@ def main_process(input_text, words):
 # SERVER
 
 import uvicorn
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from jobs import JobStore, JobManager
+from session import TranslationSession
 
 app = FastAPI()
 
@@ -163,6 +251,120 @@ async def process_text(request: Request):
     processed_text = main_process(text, words)
     return {"ok": True, "processed_text": processed_text}
 
+# Background jobs for long texts
+job_manager = JobManager(
+    store=JobStore(JOBS_DATABASE),
+    process=main_process,
+    max_workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    callback_url=JOB_CALLBACK_URL
+)
+job_manager.resume()
+
+@app.post("/jobs")
+async def create_job(request: Request):
+    """
+    Endpoint to queue the interpretation of a text as a background job.
+
+    This endpoint receives the same JSON message as `/process_text` and returns immediately
+    with the ID of the job. If `JOB_CALLBACK_URL` is set, it receives the final state of the job.
+
+    Args:
+        request (Request): The incoming HTTP request containing JSON data with keys "text" and "words".
+
+    Returns:
+        dict: A JSON response with a status indicator and the job ID.
+              Example:
+              {
+                  "ok": True,
+                  "job_id": "4f1c0c5d3a8e4b7f9a0e2d6b1c3f5a7e"
+              }
+    """
+    data = await request.json()
+    text = data.get("text", "")
+    words = data.get("words", [])
+    job_id = job_manager.submit(text, words)
+    if job_id is None:
+        return JSONResponse(status_code=503, content={"ok": False, "error": "Job queue is full"})
+    return {"ok": True, "job_id": job_id}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Endpoint to poll the state of a background job.
+
+    Args:
+        job_id (str): The ID returned by `/jobs`.
+
+    Returns:
+        dict: A JSON response with the job status ("queued", "running", "done" or "failed"),
+              the processed text once done, and the error if it failed.
+              Example:
+              {
+                  "ok": True,
+                  "job_id": "4f1c0c5d3a8e4b7f9a0e2d6b1c3f5a7e",
+                  "status": "done",
+                  "processed_text": ["HOLA", "BUENOS_DIAS", "IDLE"],
+                  "error": None
+              }
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Job not found"})
+    return {"ok": True, **job}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Endpoint to monitor the server.
+
+    Returns:
+        dict: A JSON response with the metrics of the sentence cache, the circuit breaker
+              and the hedged calls to the assistant.
+    """
+    return {
+        "ok": True,
+        "cache": sentence_cache.metrics(),
+        "breaker": BREAKER.metrics(),
+        "hedging": HEDGER.metrics()
+    }
+
+@app.websocket("/ws/session")
+async def translation_session(websocket: WebSocket):
+    """
+    WebSocket endpoint for incremental interpretation while the user edits a text.
+
+    Each message sent by the client is a JSON object with the same keys as `/process_text`.
+    The session remembers the sentences of the previous message, so only new or edited
+    sentences are interpreted again; the others reuse their previous result.
+
+    Args:
+        websocket (WebSocket): The client connection.
+
+    Returns:
+        None: For each message, a JSON response is sent with the full processed text,
+              the tokens of each sentence and the indexes of the re-interpreted sentences.
+              Example:
+              {
+                  "ok": True,
+                  "processed_text": ["HOLA", "IDLE", "BIEN", "IDLE"],
+                  "sentences": [["HOLA", "IDLE"], ["BIEN", "IDLE"]],
+                  "changed": [1],
+                  "errors": []
+              }
+    """
+    await websocket.accept()
+    words = []
+    session = TranslationSession(lambda sentence: main_process(sentence, words))
+    try:
+        while True:
+            data = await websocket.receive_json()
+            words[:] = data.get("words", words)
+            state = await run_in_threadpool(session.update, data.get("text", ""))
+            await websocket.send_json({"ok": True, **state})
+    except WebSocketDisconnect:
+        print("Session closed")
+
 if __name__ == "__main__":
     """
     The server listens on all available IP addresses on port 8000.
@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ----------------------------------------------------------------
+# CONSTANTS
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# ----------------------------------------------------------------
+# CIRCUIT BREAKER
+
+class CircuitBreaker:
+    """
+    Stop calling a degraded service when its recent error rate is too high.
+
+    The breaker is closed while calls succeed. When the error rate of the last `window`
+    calls reaches `error_rate`, it opens and every call is rejected immediately.
+    After `cooldown` seconds it lets one trial call through (half-open): a success
+    closes it again, a failure opens it for another cooldown.
+    """
+
+    def __init__(self, error_rate=0.5, window=20, min_calls=5, cooldown=30):
+        """
+        Args:
+            error_rate (float, optional): Error rate that opens the breaker. Defaults to 0.5.
+            window (int, optional): Number of recent calls used to compute the error rate. Defaults to 20.
+            min_calls (int, optional): Minimum number of calls before the breaker can open. Defaults to 5.
+            cooldown (int, optional): Seconds to wait before a trial call. Defaults to 30.
+        """
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.results = deque(maxlen=window)
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.stats = Counter()
+
+    def is_open(self):
+        """
+        Check, without taking a trial call, whether calls are currently rejected.
+
+        Returns:
+            bool: True if the breaker is open and still cooling down.
+        """
+        with self.lock:
+            if self.state == STATE_OPEN:
+                return time.monotonic() - self.opened_at < self.cooldown
+            return self.state == STATE_HALF_OPEN and self.trial_running
+
+    def allow(self):
+        """
+        Check whether a call can be made.
+
+        Returns:
+            bool: True if the call can be made, False if it must fail fast.
+        """
+        with self.lock:
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = STATE_HALF_OPEN
+                self.trial_running = False
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record(self, success):
+        """
+        Record the outcome of a call.
+
+        Args:
+            success (bool): True if the call succeeded.
+        """
+        with self.lock:
+            self.stats["successes" if success else "failures"] += 1
+            if self.state == STATE_HALF_OPEN:
+                self.trial_running = False
+                if success:
+                    self.state = STATE_CLOSED
+                    self.results.clear()
+                else:
+                    self._open()
+                return
+            self.results.append(success)
+            failures = self.results.count(False)
+            if (self.state == STATE_CLOSED and len(self.results) >= self.min_calls
+                    and failures / len(self.results) >= self.error_rate):
+                self._open()
+
+    def metrics(self):
+        """
+        Return the state and counters of the breaker.
+
+        Returns:
+            dict: The state, recent error rate and counters of the breaker.
+        """
+        with self.lock:
+            return {
+                "state": self.state,
+                "error_rate": self.results.count(False) / len(self.results) if self.results else 0.0,
+                "successes": self.stats["successes"],
+                "failures": self.stats["failures"],
+                "rejected": self.stats["rejected"],
+                "opened": self.stats["opened"]
+            }
+
+    def _open(self):
+        self.state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        self.stats["opened"] += 1
+        print("Circuit breaker opened.")
+
+# ----------------------------------------------------------------
+# HEDGED CALLS
+
+class HedgedCaller:
+    """
+    Run a call with a deadline, and start a duplicate call when it is slower than usual.
+
+    The latency of the successful calls is tracked; when a call has been running longer
+    than the chosen percentile of these latencies, a hedged duplicate is started and the
+    first result is kept. The calls still running are told to stop through their cancel event.
+    """
+
+    def __init__(self, percentile=95, default_delay=30, min_samples=10, window=100, max_workers=8):
+        """
+        Args:
+            percentile (int, optional): Latency percentile that triggers the hedged call. Defaults to 95.
+            default_delay (int, optional): Seconds before hedging while there are too few samples. Defaults to 30.
+            min_samples (int, optional): Number of samples needed to use the percentile. Defaults to 10.
+            window (int, optional): Number of recent latencies kept. Defaults to 100.
+            max_workers (int, optional): Number of threads running the calls. Defaults to 8.
+        """
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.stats = Counter()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ivilsb-hedge")
+
+    def hedge_delay(self):
+        """
+        Return the number of seconds to wait before starting the hedged call.
+
+        Returns:
+            float: The latency percentile, or the default delay if there are too few samples.
+        """
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return self.default_delay
+            latencies = sorted(self.latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return latencies[index]
+
+    def call(self, attempt, deadline):
+        """
+        Run `attempt` and possibly a hedged duplicate, until one returns a result or the deadline passes.
+
+        Args:
+            attempt (callable): Function called as `attempt(index, deadline, cancel_event)`, where index is
+                0 for the first call and 1 for the hedged call. It returns the result or None on failure.
+            deadline (float): Time (from `time.monotonic`) after which the call is abandoned.
+
+        Returns:
+            The first result that is not None, or None if every call failed or the deadline passed.
+        """
+        start = time.monotonic()
+        cancel_events = [threading.Event(), threading.Event()]
+        pending = {self.executor.submit(attempt, 0, deadline, cancel_events[0])}
+        hedge_future = None
+        hedge_at = start + self.hedge_delay()
+        result = None
+        with self.lock:
+            self.stats["calls"] += 1
+        while pending and result is None:
+            now = time.monotonic()
+            if now >= deadline:
+                with self.lock:
+                    self.stats["deadline_exceeded"] += 1
+                print("Call deadline exceeded.")
+                break
+            timeout = min(deadline, hedge_at) - now if hedge_future is None else deadline - now
+            done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result() is not None:
+                    result = future.result()
+                    if future is hedge_future:
+                        with self.lock:
+                            self.stats["hedges_won"] += 1
+                    break
+            # A first call that fails is not hedged: the failure is reported to the caller
+            if result is None and hedge_future is None and pending and time.monotonic() >= hedge_at:
+                print("Call slower than expected, starting hedged call...")
+                with self.lock:
+                    self.stats["hedges"] += 1
+                hedge_future = self.executor.submit(attempt, 1, deadline, cancel_events[1])
+                pending.add(hedge_future)
+        # Tell the calls that are still running to stop
+        for event in cancel_events:
+            event.set()
+        if result is not None:
+            with self.lock:
+                self.latencies.append(time.monotonic() - start)
+        return result
+
+    def metrics(self):
+        """
+        Return the hedging counters.
+
+        Returns:
+            dict: The number of calls, hedged calls, hedged calls that won, expired deadlines
+                  and the current hedge delay.
+        """
+        hedge_delay = self.hedge_delay()
+        with self.lock:
+            return {
+                "calls": self.stats["calls"],
+                "hedges": self.stats["hedges"],
+                "hedges_won": self.stats["hedges_won"],
+                "deadline_exceeded": self.stats["deadline_exceeded"],
+                "hedge_delay": hedge_delay
+            }
@@ -0,0 +1,93 @@
+import re
+
+# ----------------------------------------------------------------
+# FUNCTIONS
+
+SENTENCE_PATTERN = re.compile(r'[^.!?]+[.!?]*')
+
+def split_sentences(text):
+    """
+    Split a text into sentences, keeping the final punctuation of each sentence.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: A list of sentences with normalized whitespace.
+    """
+    sentences = []
+    for match in SENTENCE_PATTERN.findall(text):
+        sentence = " ".join(match.split())
+        if sentence and sentence.strip(".!?¿¡ "):
+            sentences.append(sentence)
+    return sentences
+
+# ----------------------------------------------------------------
+# SESSION
+
+class TranslationSession:
+    """
+    Keep the sentences of an editing session and their translations.
+
+    Each new submission is compared sentence by sentence with the previous one:
+    unchanged sentences reuse their cached tokens and only new or edited sentences
+    are sent to the translation function.
+    """
+
+    def __init__(self, translate):
+        """
+        Args:
+            translate (callable): Function called as `translate(sentence)` that returns a list of tokens.
+        """
+        self.translate = translate
+        self.sentences = []
+        self.tokens = {}
+
+    def update(self, text):
+        """
+        Translate a new version of the text, reusing the unchanged sentences.
+
+        Args:
+            text (str): The full text submitted by the user.
+
+        Returns:
+            dict: The updated session state.
+                  Example:
+                  {
+                      "processed_text": ["HOLA", "IDLE", "BIEN", "IDLE"],
+                      "sentences": [["HOLA", "IDLE"], ["BIEN", "IDLE"]],
+                      "changed": [1],
+                      "errors": []
+                  }
+        """
+        sentences = split_sentences(text)
+        tokens = {}
+        results = []
+        changed = []
+        errors = []
+        for index, sentence in enumerate(sentences):
+            if sentence not in tokens:
+                if sentence in self.tokens:
+                    # Unchanged sentence: reuse the previous result
+                    tokens[sentence] = self.tokens[sentence]
+                else:
+                    # New or edited sentence: translate it
+                    changed.append(index)
+                    try:
+                        tokens[sentence] = self.translate(sentence)
+                    except Exception as e:
+                        print(f"Error translating sentence '{sentence}': {e}")
+                        errors.append({"index": index, "sentence": sentence, "error": str(e)})
+                        results.append([])
+                        continue
+            results.append(tokens[sentence])
+        # Only the sentences of the current text are kept
+        self.sentences = sentences
+        self.tokens = tokens
+        print(f"Session update: {len(sentences)} sentences, {len(changed)} translated")
+        return {
+            "processed_text": [token for result in results for token in result],
+            "sentences": results,
+            "changed": changed,
+            "errors": errors
+        }
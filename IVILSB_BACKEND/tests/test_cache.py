@@ -0,0 +1,37 @@
+from cache import SemanticCache, is_single_sentence
+
+def test_exact_hit():
+    cache = SemanticCache()
+    cache.store("¿Cómo estás?", "COMO TU .")
+    assert cache.lookup("como estas") == "COMO TU ."
+
+def test_near_hit_with_spelling_difference():
+    cache = SemanticCache()
+    cache.store("Mañana quiero comer pescado con mi familia.", "MAÑANA YO QUERER COMER PESCADO FAMILIA .")
+    assert cache.lookup("Mañana qiero comer pescado con mi familia.") == "MAÑANA YO QUERER COMER PESCADO FAMILIA ."
+
+def test_negation_is_not_a_near_hit():
+    cache = SemanticCache()
+    cache.store("Yo quiero comer pescado con mi familia mañana.", "YO QUERER COMER PESCADO FAMILIA MAÑANA .")
+    assert cache.lookup("Yo no quiero comer pescado con mi familia mañana.") is None
+
+def test_reversed_sentence_is_not_a_near_hit():
+    cache = SemanticCache()
+    cache.store("El coche era lento y ahora es rápido.", "COCHE ANTES LENTO AHORA RAPIDO .")
+    assert cache.lookup("El coche era rápido y ahora es lento.") is None
+
+def test_changed_word_in_a_text_is_not_a_near_hit():
+    cache = SemanticCache()
+    text = "Hola, me llamo Ana. El lunes voy al mercado con mi hermana. Después comemos juntas en casa."
+    cache.store(text, "HOLA YO NOMBRE A-N-A . LUNES YO IR MERCADO HERMANA . DESPUES COMER JUNTOS CASA .")
+    assert not is_single_sentence(text)
+    assert cache.lookup(text.replace("lunes", "martes")) is None
+    sentence = "El lunes por la mañana voy al mercado grande del centro con mi hermana pequeña."
+    cache.store(sentence, "LUNES MAÑANA YO IR MERCADO GRANDE CENTRO HERMANA PEQUEÑO .")
+    assert cache.lookup(sentence.replace("lunes", "martes")) is None
+
+def test_near_hit_is_validated():
+    cache = SemanticCache()
+    cache.store("Mañana quiero comer pescado con mi familia.", "MAÑANA YO QUERER COMER PESCADO FAMILIA .")
+    assert cache.lookup("Mañana qiero comer pescado con mi familia.", validate=lambda result: False) is None
+    assert cache.metrics()["rejected"] == 1
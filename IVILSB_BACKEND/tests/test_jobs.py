@@ -0,0 +1,25 @@
+import time
+
+from jobs import JobManager, JobStore, STATUS_DONE
+
+def wait_jobs(manager, job_ids, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if all(manager.get(job_id)["status"] == STATUS_DONE for job_id in job_ids):
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_resume_more_jobs_than_slots(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_ids = [store.create(f"frase {i}", []) for i in range(5)]
+    manager = JobManager(store, lambda text, words: text.upper().split(), max_workers=1, max_pending=2)
+    assert manager.resume() == 5
+    assert wait_jobs(manager, job_ids)
+    assert manager.get(job_ids[-1])["processed_text"] == ["FRASE", "4"]
+
+def test_submit_when_full(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    manager = JobManager(store, lambda text, words: time.sleep(0.2) or [], max_workers=1, max_pending=1)
+    assert manager.submit("hola", []) is not None
+    assert manager.submit("adios", []) is None
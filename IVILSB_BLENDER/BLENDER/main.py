@@ -7,6 +7,7 @@ from bpy.props import StringProperty, BoolProperty, PointerProperty, CollectionP
 import math
 import re
 import os
+import socket
 
 # ---------------------
 # $1 UTILITY FUNCTIONS
@@ -26,13 +27,39 @@ def select_bone(armature, bone_name):
         bpy.context.object.data.bones.active = armature.data.bones[pose_bone.name]
     return pose_bone
 
-# Function to parse string to list of floats
-def parse_rotation_input(input_string):
+# Function to parse string, or list of numbers from the database, to list of floats
+def parse_rotation_input(input_value):
     try:
-        return [float(x) for x in input_string.strip('[]').split(',')]
-    except ValueError:
+        if isinstance(input_value, (list, tuple)):
+            return [float(x) for x in input_value]
+        return [float(x) for x in input_value.strip('[]').split(',')]
+    except (TypeError, ValueError):
         return None
 
+# Function to expand the REPEAT and SPEED nodes of an animation compiled to database.ir.json (see compiler.expand)
+def expand_poses(body, speed=None):
+    for node in body:
+        if 'RH' in node:
+            yield dict(node, speed=1 if speed is None else speed)
+        elif 'repeat' in node:
+            for _ in range(node['repeat']):
+                yield from expand_poses(node['body'], speed)
+        else:
+            yield from expand_poses(node['body'], node['speed'] if speed is None else speed)
+
+# Function to convert a database with interned poses (database.pool.json, see compiler.intern_animations)
+# to a list of animations; each unique pose is built once
+def resolve_pool(pool):
+    keys = ('RH', 'R1', 'R2', 'R3', 'LH', 'L1', 'L2', 'L3')
+    poses = [{key: pool["hands"][index] if key in ('RH', 'LH') else pool["vectors"][index]
+              for key, index in zip(keys, pose)} for pose in pool["poses"]]
+
+    def resolve_body(body):
+        return [dict(node, body=resolve_body(node['body'])) if isinstance(node, dict) else poses[node] for node in body]
+
+    return [{name: {"name": animation["name"], "body": resolve_body(animation["body"])}
+             for name, animation in entry.items()} for entry in pool["animations"]]
+
 # Convert degrees to radians
 def degrees_to_radians(degrees):
     return [math.radians(deg) for deg in degrees]
@@ -138,6 +165,8 @@ SCALE_LEFT = []
 RIGHT_HAND_BONES = []
 LEFT_HAND_BONES = []
 ANIMATIONS = []
+WATCH_PORT = 52837  # UDP port notified by COMPILER/watch.py --notify
+WATCH_SOCKET = None
 
 def load_constants_from_json(filepath):
     try:
@@ -192,6 +221,8 @@ def load_database_from_json(filepath):
     try:
         with open(bpy.path.abspath(filepath), 'r') as f:
             data = json.load(f)
+        if isinstance(data, dict) and "animations" in data:
+            data = resolve_pool(data)
         
         if isinstance(data, list):
             print("\n-----------------------------------")
@@ -200,7 +231,7 @@ def load_database_from_json(filepath):
             for entry in data:
                 if isinstance(entry, dict):
                     for animation_name, animation_content in entry.items():
-                        ANIMATIONS.append(animation_content)
+                        ANIMATIONS.append(expand_animation(animation_content))
                         print(animation_name)
                         count += 1
                 else:
@@ -216,6 +247,52 @@ def load_database_from_json(filepath):
     except Exception as e:
         print(f"Failed to load database from {filepath}: {e}")
 
+# Function to expand an animation of database.ir.json or database.pool.json into its keyframes
+def expand_animation(animation_content):
+    if "body" in animation_content:
+        return {"name": animation_content["name"], "poses": list(expand_poses(animation_content["body"]))}
+    return animation_content
+
+# Function to replace the changed animations of a database, and remove the removed ones, keeping the others loaded
+def reload_animations(filepath, changed, removed):
+    global ANIMATIONS
+    with open(filepath, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "animations" in data:
+        data = resolve_pool(data)
+    reloaded = {}
+    for entry in data:
+        for animation_name, animation_content in entry.items():
+            if animation_name in changed and animation_name not in reloaded:
+                reloaded[animation_name] = expand_animation(animation_content)
+    animations = []
+    for animation_content in ANIMATIONS:
+        animation_name = animation_content.get("name")
+        if animation_name in reloaded:
+            animations.append(reloaded.pop(animation_name))
+        elif animation_name not in removed:
+            animations.append(animation_content)
+    ANIMATIONS = animations + list(reloaded.values())
+    print(f"Reloaded: {', '.join(changed) or '-'} | removed: {', '.join(removed) or '-'}")
+
+# Timer reading the notifications of the watcher, until the socket is closed
+def poll_watch_socket():
+    if WATCH_SOCKET is None:
+        return None
+    while True:
+        try:
+            message = json.loads(WATCH_SOCKET.recv(65536))
+        except BlockingIOError:
+            break
+        except Exception as e:
+            print(f"Failed to read the watcher notification: {e}")
+            continue
+        try:
+            reload_animations(message["database"], message.get("changed", []), message.get("removed", []))
+        except Exception as e:
+            print(f"Failed to reload {message.get('database')}: {e}")
+    return 0.2
+
 class GLOBAL_Load_JSON(Operator):
     bl_idname = "ivi_lsb.load_constants"
     bl_label = "Load JSON files"
@@ -237,6 +314,30 @@ class GLOBAL_Load_JSON(Operator):
             self.report({'ERROR'}, f"Failed to load constants or database: {str(e)}")
         return {'FINISHED'}
 
+class GLOBAL_Watch_Database(Operator):
+    bl_idname = "ivi_lsb.watch_database"
+    bl_label = "Watch Database"
+    bl_description = "Reload the signs recompiled by the compiler watch mode (COMPILER/watch.py --notify)"
+
+    def execute(self, context):
+        global WATCH_SOCKET
+        if WATCH_SOCKET is not None:
+            WATCH_SOCKET.close()
+            WATCH_SOCKET = None
+            self.report({'INFO'}, "Stopped watching the database.")
+            return {'FINISHED'}
+        try:
+            WATCH_SOCKET = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            WATCH_SOCKET.bind(('127.0.0.1', WATCH_PORT))
+            WATCH_SOCKET.setblocking(False)
+        except OSError as e:
+            WATCH_SOCKET = None
+            self.report({'ERROR'}, f"Failed to listen on port {WATCH_PORT}: {str(e)}")
+            return {'CANCELLED'}
+        bpy.app.timers.register(poll_watch_socket, first_interval=0.2)
+        self.report({'INFO'}, f"Watching the database on port {WATCH_PORT}.")
+        return {'FINISHED'}
+
 class GLOBAL_FileProperties(PropertyGroup):
     json_filepath: StringProperty( 
         name="Constants (JSON)",
@@ -653,6 +754,42 @@ class HAND_Import_Operator(Operator):
 
         return {'FINISHED'}
 
+# Operator to export the hand bone channels of every hand pose, read by COMPILER/baker.py
+class HAND_Export_Table(Operator):
+    bl_idname = "hand_pose.export_table"
+    bl_label = "Export Hand Poses"
+    bl_description = "Export the hand bone rotations of the hand poses to hand_poses.json, for the compiler baker"
+
+    def execute(self, context):
+        directory = bpy.path.abspath(context.scene.hand_pose_selector_props.directory)
+        if not directory:
+            self.report({'ERROR'}, "Directory not set")
+            return {'CANCELLED'}
+
+        hand_bones = set(RIGHT_HAND_BONES) | set(LEFT_HAND_BONES)
+        table = {}
+        try:
+            for file_name in sorted(os.listdir(directory)):
+                if not file_name.endswith(".blend"):
+                    continue
+                with bpy.data.libraries.load(os.path.join(directory, file_name)) as (data_from, data_to):
+                    data_to.objects = data_from.objects
+                for obj in data_to.objects:
+                    if obj and obj.type == 'ARMATURE':
+                        table[file_name[:-6]] = {bone.name: {"location": list(bone.location),
+                                                             "rotation_quaternion": list(bone.rotation_quaternion),
+                                                             "scale": list(bone.scale)}
+                                                 for bone in obj.pose.bones if bone.name in hand_bones}
+                        break
+            with open(os.path.join(directory, "hand_poses.json"), 'w') as f:
+                json.dump(table, f, indent=4)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to export hand poses: {str(e)}")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"{len(table)} hand poses exported to hand_poses.json.")
+        return {'FINISHED'}
+
 # ---------------------
 # $8 HAND POSE CLASSES
 
@@ -778,6 +915,8 @@ class HAND_Panel(Panel):
             layout.prop(context.scene.hand_pose_selector_props, "selected_pose_left", text="")
             layout.operator("left_hand_pose.apply", text="Apply Pose")
 
+        layout.operator("hand_pose.export_table", text="Export Hand Poses")
+
 # ---------------------
 # $9 GLOBAL PANEL
 
@@ -796,6 +935,7 @@ class GLOBAL_Panel(Panel):
         layout.prop(context.scene.ivi_lsb_props, "file_path", text="Database (JSON)")
         layout.prop(context.scene.hand_pose_selector_props, "directory", text="Hand Poses (DIR)")
         layout.operator("ivi_lsb.load_constants", text="Load JSON files")
+        layout.operator("ivi_lsb.watch_database", text="Stop Watching" if WATCH_SOCKET is not None else "Watch Database")
         layout.operator("hand_pose.import", text="Load Hand Poses")
         layout.prop(global_props, "pose_input_string", text="Global Input")
         layout.operator("ivi_lsb.apply_pose_from_input", text="Apply Global Pose")
@@ -996,6 +1136,7 @@ class ANIMATION_Panel(Panel):
         row.operator("ivi_lsb.reset_all_animations", text="Reset All Transformations")
         row.operator("ivi_lsb.delete_all_keyframes", text="Clear All Keyframes")
         layout.operator("ivi_lsb.create_animation", text="Animate!")
+        layout.operator("ivi_lsb.export_tracks", text="Export Baked Tracks")
     
 # Operator to reset all transformations (rotation, location, and scale) for the entire armature
 class ANIMATION_Reset_All(Operator):
@@ -1081,10 +1222,12 @@ class ANIMATION_Create_Animation(Operator):
             # print(poses)
 
             # duplicate first and last pose
-            pose_i = poses[0]
-            pose_f = poses[-1]
-            pose_i['speed'] = 2
-            pose_f['speed'] = 2
+            # (the padding poses are copies without the "hold" of a simplified database)
+            poses = list(poses)
+            poses[0] = dict(poses[0], speed=2)
+            poses[-1] = dict(poses[-1], speed=2)
+            pose_i = {key: value for key, value in poses[0].items() if key != 'hold'}
+            pose_f = {key: value for key, value in poses[-1].items() if key != 'hold'}
             poses = [pose_i] + poses + [pose_f]
                         
             frame = 1
@@ -1097,7 +1240,7 @@ class ANIMATION_Create_Animation(Operator):
                 
                 # Apply arm rotations
                 for bone_name, rot in pose.items():
-                    if bone_name in ['RH', 'LH', 'speed']:
+                    if bone_name in ['RH', 'LH', 'speed', 'hold']:
                         continue
                     
                     bone_side = 'left' if 'L' in bone_name else 'right'
@@ -1156,6 +1299,9 @@ class ANIMATION_Create_Animation(Operator):
                             print(f"Failed to apply hand pose {pose_file}: {e}")
 
                 frame += int(duration)
+                # keyframes dropped by the compiler simplification, see compiler.simplify_poses
+                for hold_speed in pose.get('hold', []):
+                    frame += int(keyframe_spacing / hold_speed)
 
             print(f"Animation created: {animation_name}")
             print(f"Length (frames): {frame}\n")
@@ -1165,6 +1311,45 @@ class ANIMATION_Create_Animation(Operator):
         print("Animation creation process completed successfully.")
         return {'FINISHED'}
 
+# Operator to sample the F-Curves of the created animations, to check the parity of COMPILER/baker.py
+class ANIMATION_Export_Tracks(Operator):
+    bl_label = "Export Baked Tracks"
+    bl_idname = "ivi_lsb.export_tracks"
+    bl_description = "Export every frame of the created animations to tracks.blender.json, next to the database"
+
+    def execute(self, context):
+        db_filepath = context.scene.ivi_lsb_props.file_path
+        if not db_filepath:
+            self.report({'ERROR'}, "Database path not set.")
+            return {'CANCELLED'}
+
+        signs = {}
+        for animation_content in ANIMATIONS:
+            animation_name = animation_content.get("name")
+            action = bpy.data.actions.get(animation_name)
+            if not action:
+                continue
+            start, end = (int(frame) for frame in action.frame_range)
+            channels = {}
+            for fcurve in action.fcurves:
+                match = re.match(r'pose\.bones\["(.+)"\]\.(\w+)$', fcurve.data_path)
+                if match:
+                    channel = channels.setdefault(f"{match.group(1)}/{match.group(2)}", {})
+                    channel[fcurve.array_index] = [fcurve.evaluate(frame) for frame in range(start, end + 1)]
+            signs[animation_name] = {"start": start,
+                                     "channels": {key: [list(values) for values in zip(*(channel[i] for i in sorted(channel)))]
+                                                  for key, channel in channels.items()}}
+
+        filepath = os.path.join(os.path.dirname(bpy.path.abspath(db_filepath)), "tracks.blender.json")
+        try:
+            with open(filepath, 'w') as f:
+                json.dump({"fps": context.scene.render.fps, "signs": signs}, f)
+        except Exception as e:
+            self.report({'ERROR'}, f"Failed to export tracks: {str(e)}")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"{len(signs)} animations exported to {filepath}.")
+        return {'FINISHED'}
+
 # ---------------------
 # $X REGISTER COMPONENTS
 
@@ -1183,6 +1368,7 @@ classes = [
     HAND_Panel,
     HAND_Properties,
     HAND_Import_Operator,
+    HAND_Export_Table,
     HAND_RIGHT_Apply_Pose,
     HAND_LEFT_Apply_Pose,
     GLOBAL_Panel,
@@ -1192,11 +1378,13 @@ classes = [
     GLOBAL_CopyToClipboard,
     GLOBAL_Reset_All,
     GLOBAL_Load_JSON,
+    GLOBAL_Watch_Database,
     ANIMATION_Panel,
     ANIMATION_Properties,
     ANIMATION_Reset_All,            
     ANIMATION_Reset_Keyframes,
-    ANIMATION_Create_Animation
+    ANIMATION_Create_Animation,
+    ANIMATION_Export_Tracks
 ]
 
 def register():
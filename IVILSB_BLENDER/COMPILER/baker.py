@@ -0,0 +1,611 @@
+# baker.py
+import argparse
+import json
+import struct
+import time
+
+import compiler
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CONSTANTS_JSON = 'BLENDER/constants.json'
+HAND_TABLE = 'BLENDER/hand_poses/hand_poses.json'      # written by the "Export Hand Poses" button of the plug-in
+AVATAR_GLB = '../IVILSB_FRONTEND/public/FBX/main.glb'  # the baked animations target its nodes
+BATCH_SIGNS = 16   # signs sampled together, bounds the memory of a batch
+TOLERANCE = 1e-4   # parity with the tracks baked by Blender, in channel units
+
+# Blender defaults of the keyframes inserted by the plug-in: Bezier interpolation, "Auto Clamped" handles
+# and constant extrapolation. 2.5614 is the handle length factor of Blender (BKE_nurb_handle_calc).
+HANDLE_FACTOR = 2.5614
+SMOOTHING = 'CONT_ACCEL'  # "New Curve Smoothing" of the Blender preferences, 'CONT_ACCEL' (default) or 'NONE'
+# Rest values of the hand bone channels missing from the hand pose table
+REST = {'location': (0.0, 0.0, 0.0), 'rotation_quaternion': (1.0, 0.0, 0.0, 0.0), 'scale': (1.0, 1.0, 1.0)}
+HAND_PATHS = ('location', 'rotation_quaternion', 'scale')
+GLTF_PATHS = {'location': 'translation', 'rotation_quaternion': 'rotation', 'scale': 'scale'}
+
+def require_numpy():
+    if np is None:
+        raise ImportError("numpy is required to bake the animations (pip install numpy)")
+
+# ----------------------------------------------------------------
+# INPUTS
+
+def load_constants(path):
+    """Return the constants.json of the plug-in."""
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def load_hand_table(path):
+    """
+    Return the hand pose table exported by the plug-in.
+
+    Returns:
+        dict: {pose: {bone: {"location", "rotation_quaternion", "scale"}}}, the pose bone channels of each
+              .blend hand pose, as copied by ANIMATION_Create_Animation (quaternions are w, x, y, z).
+    """
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def channel_layout(constants):
+    """
+    Return the channels baked for each frame, as (bone, path, start, width) in the rows of the tracks.
+
+    The arm bones (R1 to L3) have a quaternion; each hand bone has a location, a quaternion and a scale.
+    """
+    layout = []
+    start = 0
+    for side in ('RIGHT', 'LEFT'):
+        for index in range(1, 4):
+            layout.append((constants[f"{side}_BONE_{index}"], 'rotation_quaternion', start, 4))
+            start += 4
+    for side in ('RIGHT', 'LEFT'):
+        for bone in constants[f"{side}_HAND_BONES"]:
+            for path in HAND_PATHS:
+                layout.append((bone, path, start, len(REST[path])))
+                start += len(REST[path])
+    return layout
+
+def hand_matrix(hand_table, bones):
+    """
+    Return the names of the hand poses and the matrix of their channels for the bones of one hand.
+
+    The channels of a bone missing from a pose are those of the rest pose.
+    """
+    names = sorted(hand_table)
+    matrix = np.array([[value for bone in bones for path in HAND_PATHS
+                        for value in hand_table[name].get(bone, {}).get(path, REST[path])] for name in names],
+                      dtype=np.float64).reshape(len(names), len(bones) * 10)
+    return {name: index for index, name in enumerate(names)}, matrix
+
+# ----------------------------------------------------------------
+# ROTATIONS
+# Quaternions are (w, x, y, z), as in Blender, on the last axis of the arrays.
+
+def euler_to_quaternion(angles):
+    """Convert XYZ Euler angles in radians to quaternions, as mathutils.Euler.to_quaternion does."""
+    half = np.asarray(angles, dtype=np.float64) * 0.5
+    cx, cy, cz = np.cos(half[..., 0]), np.cos(half[..., 1]), np.cos(half[..., 2])
+    sx, sy, sz = np.sin(half[..., 0]), np.sin(half[..., 1]), np.sin(half[..., 2])
+    return np.stack([cy * cx * cz + sy * sx * sz,
+                     cy * sx * cz - sy * cx * sz,
+                     cy * sx * sz + sy * cx * cz,
+                     cy * cx * sz - sy * sx * cz], axis=-1)
+
+def quaternion_multiply(a, b):
+    """Hamilton product of quaternions."""
+    aw, ax, ay, az = np.moveaxis(a, -1, 0)
+    bw, bx, by, bz = np.moveaxis(b, -1, 0)
+    return np.stack([aw * bw - ax * bx - ay * by - az * bz,
+                     aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw], axis=-1)
+
+def quaternion_rotate(q, v):
+    """Rotate vectors by unit quaternions."""
+    u = q[..., 1:]
+    t = 2.0 * np.cross(u, v)
+    return v + q[..., :1] * t + np.cross(u, t)
+
+# ----------------------------------------------------------------
+# F-CURVES
+# The sampled values are those of Blender's F-Curves: the handles of each keyframe are computed as
+# BKE_nurb_handle_calc does for "Auto Clamped" handles, flat on the first and last keyframes and on the
+# extrema, and a frame between two keyframes is evaluated on their cubic Bezier segment. With the
+# "Continuous Acceleration" smoothing (BKE_nurb_handle_smooth_fcurve), the handles of the keyframes between
+# two flat ones are then solved together so that the curve has no jump of acceleration.
+
+def bezier_handles(x, y, first, last, smoothing=SMOOTHING):
+    """
+    Compute the handles of the keyframes of several F-Curves that share their frames.
+
+    Args:
+        x (ndarray): Frames of the keyframes, shape (keys,), increasing within each animation.
+        y (ndarray): Values of the keyframes, shape (keys, channels).
+        first (ndarray): True for the first keyframe of each animation.
+        last (ndarray): True for the last keyframe of each animation.
+        smoothing (str, optional): 'CONT_ACCEL' or 'NONE', the smoothing of the F-Curves. Defaults to SMOOTHING.
+
+    Returns:
+        tuple: The frames (keys,) and values (keys, channels) of the left handles, then of the right handles.
+    """
+    prev = np.maximum(np.arange(len(x)) - 1, 0)
+    next = np.minimum(np.arange(len(x)) + 1, len(x) - 1)
+    dx_a = np.where(first, x[next] - x, x - x[prev])
+    dx_b = np.where(last, dx_a, x[next] - x)
+    dx_a = np.where(dx_a == 0, 1.0, dx_a)
+    dx_b = np.where(dx_b == 0, 1.0, dx_b)
+    if smoothing == 'CONT_ACCEL':
+        # The smoothing keeps the handles at a third of the segments, without the 5x clamp
+        len_a, len_b, length = dx_a, dx_b, 6.0
+    else:
+        length = 2.0 * HANDLE_FACTOR
+        len_a = np.minimum(dx_a, 5.0 * dx_b)
+        len_b = np.minimum(dx_b, 5.0 * len_a)
+    left_x = x - 2.0 * len_a / length
+    right_x = x + 2.0 * len_b / length
+
+    # The values are computed in the precision of y
+    y_prev = y[prev]
+    y_next = y[next]
+    inner = ~(first | last)[:, None]
+    ydiff1 = y_prev - y
+    ydiff2 = y_next - y
+    extremum = inner & (((ydiff1 <= 0) & (ydiff2 <= 0)) | ((ydiff1 >= 0) & (ydiff2 >= 0)))
+    if smoothing == 'CONT_ACCEL':
+        right_dy = smooth_offsets(dx_a, dx_b, y, y_prev, y_next, ~inner | extremum)
+        left = (y - right_dy * (dx_a / dx_b)[:, None]).astype(y.dtype)
+        right = (y + right_dy).astype(y.dtype)
+        return left_x, np.where(extremum | ~inner, y, left), right_x, np.where(extremum | ~inner, y, right)
+
+    slope_a = (y - y_prev) / dx_a.astype(y.dtype)[:, None]
+    slope_b = (y_next - y) / dx_b.astype(y.dtype)[:, None]
+    tangent = np.where(first[:, None], 2 * slope_b, np.where(last[:, None], 2 * slope_a, slope_a + slope_b))
+    left = y - tangent * (len_a / length).astype(y.dtype)[:, None]
+    right = y + tangent * (len_b / length).astype(y.dtype)[:, None]
+
+    # Auto Clamped: flat on extrema, and the handles do not overshoot the neighbouring keyframes
+    left = np.where(extremum, y, left)
+    right = np.where(extremum, y, right)
+    clamped = inner & ~extremum
+    left_violate = clamped & np.where(ydiff1 <= 0, y_prev > left, y_prev < left)
+    left = np.where(left_violate, y_prev, left)
+    right_violate = clamped & np.where(ydiff1 <= 0, y_next < right, y_next > right)
+    right = np.where(right_violate, y_next, right)
+    left_dx = (left_x - x).astype(y.dtype)[:, None]
+    right_dx = (x - right_x).astype(y.dtype)[:, None]
+    right = np.where(left_violate, y + (y - left) / left_dx * right_dx, right)
+    left = np.where(right_violate & ~left_violate, y + (y - right) / right_dx * left_dx, left)
+
+    # Constant extrapolation: the first and last keyframes have flat handles
+    ends = (first | last)[:, None]
+    return left_x, np.where(ends, y, left), right_x, np.where(ends, y, right)
+
+def smooth_offsets(dx_a, dx_b, y, y_prev, y_next, locked):
+    """
+    Solve the right handles of the "Continuous Acceleration" smoothing, as bezier_handle_calc_smooth_fcurve does.
+
+    Between two locked (flat) keyframes, the offsets h of the right handles make the second derivative
+    continuous on each free keyframe, and are kept between the neighbouring values ("Auto Clamped"): the
+    handles that overshoot are locked to their limit and the system is solved again, and a locked handle
+    is released (at most twice) when the curve pulls it back within its limits.
+
+    Args:
+        dx_a (ndarray): Frames to the previous keyframe, shape (keys,).
+        dx_b (ndarray): Frames to the next keyframe, shape (keys,).
+        y, y_prev, y_next (ndarray): Values of the keyframes and of their neighbours, shape (keys, channels).
+        locked (ndarray): True for the keyframes whose handles are flat, shape (keys, channels).
+
+    Returns:
+        ndarray: The offset of the value of the right handle of each keyframe, 0 where locked.
+    """
+    y, y_prev, y_next = (values.astype(np.float64) for values in (y, y_prev, y_next))
+    dy_a = y - y_prev
+    dy_b = y_next - y
+    ratio = dx_b / dx_a
+    l = np.broadcast_to(ratio[:, None], y.shape)
+    l_next = np.broadcast_to(np.append(ratio[1:], 1.0)[:, None], y.shape)
+    a0 = np.where(locked, 0.0, l * l)
+    b0 = np.where(locked, 1.0, 2.0 * (l + 1.0))
+    c0 = np.where(locked, 0.0, 1.0 / l_next)
+    d0 = np.where(locked, 0.0, dy_a * l * l + dy_b)
+
+    # Limits of the right handle (next segment) and of the left handle (previous segment, h / l)
+    hmin = np.full(y.shape, -np.inf)
+    hmax = np.full(y.shape, np.inf)
+    for dy in (dy_b, dy_a * l):
+        hmax = np.where(dy > 0, np.minimum(hmax, dy), 0.0)
+        hmin = np.where(dy < 0, np.maximum(hmin, dy), 0.0)
+
+    # The free keyframes between two locked ones form a run, solved on its own
+    run = np.cumsum(locked, axis=0) + np.arange(y.shape[1]) * (len(y) + 1)
+    runs = run.max() + 1
+    a, b, c, d = a0.copy(), b0.copy(), c0.copy(), d0.copy()
+    limited = np.zeros(y.shape, dtype=bool)
+    unlocks = np.zeros(y.shape, dtype=np.int8)
+    while True:
+        h = tridiagonal_solve(a, b, c, d)
+        overshoot = ~locked & ((h < hmin) | (h > hmax))
+        target = np.where(h > hmax, hmax, hmin)
+        # Only the handles with a nonzero limit are locked, unless all the handles of the run are at 0
+        nonzero = np.bincount(run[overshoot & (target != 0)], minlength=runs) > 0
+        lock = overshoot & ((target != 0) | ~nonzero[run])
+        a, b, c, d = (np.where(lock, value, array) for value, array in ((0.0, a), (1.0, b), (0.0, c), (target, d)))
+        limited |= lock
+
+        # In the runs where nothing overshoots, release the handles that the equations pull inwards
+        settled = np.bincount(run[overshoot], minlength=runs)[run] == 0
+        h_prev = np.concatenate([h[:1], h[:-1]])
+        h_next = np.concatenate([h[1:], h[-1:]])
+        relax = -(a0 * h_prev + b0 * h + c0 * h_next - d0) * b0
+        unlock = settled & limited & (unlocks < 2) & (((relax > 0) & (h < hmax)) | ((relax < 0) & (h > hmin)))
+        a, b, c, d = (np.where(unlock, original, array) for original, array in ((a0, a), (b0, b), (c0, c), (d0, d)))
+        limited &= ~unlock
+        unlocks += unlock
+        if not overshoot.any() and not unlock.any():
+            return np.where(locked, 0.0, h)
+
+def tridiagonal_solve(a, b, c, d):
+    """Solve the tridiagonal systems a[i] h[i - 1] + b[i] h[i] + c[i] h[i + 1] = d[i], one per column."""
+    c_prime = np.empty_like(c)
+    d_prime = np.empty_like(d)
+    c_prime[0] = c[0] / b[0]
+    d_prime[0] = d[0] / b[0]
+    for i in range(1, len(d)):
+        m = b[i] - a[i] * c_prime[i - 1]
+        c_prime[i] = c[i] / m
+        d_prime[i] = (d[i] - a[i] * d_prime[i - 1]) / m
+    h = np.empty_like(d)
+    h[-1] = d_prime[-1]
+    for i in range(len(d) - 2, -1, -1):
+        h[i] = d_prime[i] - c_prime[i] * h[i + 1]
+    return h
+
+def sample_bezier(x, y, handles, samples):
+    """
+    Evaluate F-Curves that share their frames.
+
+    Args:
+        x (ndarray): Frames of the keyframes, shape (keys,), strictly increasing.
+        y (ndarray): Values of the keyframes, shape (keys, channels).
+        handles (tuple): The handles returned by `bezier_handles`.
+        samples (ndarray): Frames to evaluate, within the frames of the keyframes.
+
+    Returns:
+        ndarray: The values, shape (samples, channels).
+    """
+    left_x, left, right_x, right = handles
+    index = np.searchsorted(x, samples, side='right') - 1
+    exact = samples == x[index]
+    segment = np.minimum(index + 1, len(x) - 1)
+    x0, x1, x2, x3 = x[index], right_x[index], left_x[segment], x[segment]
+    # The x of a segment is monotonic: find its parameter by bisection
+    low = np.zeros(len(samples))
+    high = np.ones(len(samples))
+    for _ in range(40):
+        t = (low + high) * 0.5
+        u = 1.0 - t
+        below = u * u * u * x0 + 3.0 * u * u * t * x1 + 3.0 * u * t * t * x2 + t * t * t * x3 < samples
+        low = np.where(below, t, low)
+        high = np.where(below, high, t)
+    t = np.where(exact, 0.0, (low + high) * 0.5).astype(y.dtype)[:, None]
+    u = 1 - t
+    y0, y1, y2, y3 = y[index], right[index], left[segment], y[segment]
+    values = u * u * u * y0 + 3 * u * u * t * y1 + 3 * u * t * t * y2 + t * t * t * y3
+    # As Blender, a segment whose handles are flat at the same value keeps it exactly
+    return np.where((y0 == y3) & (y1 == y0) & (y2 == y0), y0, values)
+
+# ----------------------------------------------------------------
+# BAKE
+
+def pose_vector(value):
+    """Return a vector of the database, which old databases store as a string (see parse_rotation_input)."""
+    return [float(x) for x in value.strip('[]').split(',')] if isinstance(value, str) else value
+
+def bake_batch(signs, constants, hands):
+    """Sample a batch of (name, poses, frames), return the (name, start, values) of each sign."""
+    scales = np.array([constants['SCALE_RIGHT'], constants['SCALE_LEFT']], dtype=np.float64).reshape(6, 3)
+    (right_index, right_matrix), (left_index, left_matrix) = hands
+    keys = [([poses[0]] + poses + [poses[-1]], frames) for _, poses, frames in signs]
+    vectors = np.array([[pose_vector(pose[key]) for key in compiler.VECTOR_KEYS] for poses, _ in keys for pose in poses],
+                       dtype=np.float64).reshape(-1, 6, 3)
+    arms = euler_to_quaternion(np.radians(vectors * scales)).reshape(len(vectors), 24)
+    right = right_matrix[[right_index[pose['RH']] for poses, _ in keys for pose in poses]]
+    left = left_matrix[[left_index[pose['LH']] for poses, _ in keys for pose in poses]]
+    # F-Curves store float32 values, so do the samples
+    y = np.concatenate([arms, right, left], axis=1).astype(np.float32)
+
+    # The frames of all the signs are laid end to end, so the batch is sampled at once
+    offsets = []
+    x = []
+    offset = 0
+    for _, frames in keys:
+        offsets.append(offset)
+        x.extend(frame + offset for frame in frames)
+        offset += frames[-1] + 1
+    x = np.array(x, dtype=np.float64)
+    sign = np.repeat(np.arange(len(keys)), [len(frames) for _, frames in keys])
+    # A keyframe inserted on the frame of the previous one replaces it
+    keep = np.append(x[1:] != x[:-1], True)
+    x, y, sign = x[keep], y[keep], sign[keep]
+    first = np.insert(sign[1:] != sign[:-1], 0, True)
+    last = np.append(sign[1:] != sign[:-1], True)
+    handles = bezier_handles(x, y, first, last)
+    starts = x[first]
+    ends = x[last]
+    samples = np.concatenate([np.arange(start, end + 1) for start, end in zip(starts, ends)])
+    values = sample_bezier(x, y, handles, samples)
+    results = []
+    position = 0
+    for (name, _, _), start, end, offset in zip(signs, starts, ends, offsets):
+        count = int(end - start) + 1
+        results.append((name, int(start - offset), values[position:position + count]))
+        position += count
+    return results
+
+def bake_animations(animations, constants, hand_table, spacing=compiler.KEYFRAME_SPACING, batch=BATCH_SIGNS):
+    """
+    Bake the animations into per-frame tracks, as ANIMATION_Create_Animation does in Blender.
+
+    The arm vectors are unscaled with SCALE_RIGHT/SCALE_LEFT, converted to radians and to quaternions,
+    the hand bones take the channels of their hand pose, and every frame from the first to the last
+    keyframe is sampled from the Bezier F-Curves that Blender would create. The signs are sampled in
+    batches of NumPy arrays.
+
+    Args:
+        animations (list): The animations, as in database.json (simplified databases included).
+        constants (dict): The constants.json of the plug-in.
+        hand_table (dict): The table returned by `load_hand_table`.
+        spacing (int, optional): The "Pose Duration" of the plug-in, in frames. Defaults to KEYFRAME_SPACING.
+        batch (int, optional): Number of signs sampled together. Defaults to BATCH_SIGNS.
+
+    Returns:
+        tuple: The channels of the tracks (see `channel_layout`), the (name, start, values) of each sign,
+               where values has one row of channels per frame from the start frame, and the report
+               {"signs", "baked", "skipped", "frames", "duration"}, where skipped gives {"sign", "message"}.
+    """
+    require_numpy()
+    start = time.perf_counter()
+    layout = channel_layout(constants)
+    hands = (hand_matrix(hand_table, constants['RIGHT_HAND_BONES']), hand_matrix(hand_table, constants['LEFT_HAND_BONES']))
+    signs = []
+    skipped = []
+    for entry in animations:
+        for name, animation in entry.items():
+            poses = animation["poses"]
+            missing = sorted({pose[key] for pose in poses for key, (index, _) in zip(compiler.HANDS, hands)
+                              if pose[key] not in index})
+            if not poses:
+                skipped.append({"sign": name, "message": "no keyframes"})
+            elif missing:
+                skipped.append({"sign": name, "message": f"no hand pose {', '.join(missing)} in the table"})
+            else:
+                signs.append((name, poses, compiler.keyframe_frames(poses, spacing)[0]))
+    tracks = []
+    for index in range(0, len(signs), batch):
+        tracks.extend(bake_batch(signs[index:index + batch], constants, hands))
+    return layout, tracks, {
+        "signs": len(signs) + len(skipped),
+        "baked": len(tracks),
+        "skipped": skipped,
+        "frames": sum(len(values) for _, _, values in tracks),
+        "duration": time.perf_counter() - start
+    }
+
+# ----------------------------------------------------------------
+# GLTF
+# The tracks are written as glTF 2.0 animations (LINEAR samplers, one sample per frame) into a copy of
+# the avatar, whose nodes have the names of the bones; Blender pose channels are relative to the rest pose,
+# so they are composed with the rest transform of each node. Without the avatar the document only
+# has one node per bone, at the origin.
+
+def read_glb(path):
+    """Return the JSON and the binary chunk of a .glb file."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    magic, _, _ = struct.unpack_from('<4sII', data, 0)
+    if magic != b'glTF':
+        raise ValueError(f"{path} is not a binary glTF file")
+    position = 12
+    gltf = None
+    binary = bytearray()
+    while position < len(data):
+        length, kind = struct.unpack_from('<II', data, position)
+        chunk = data[position + 8:position + 8 + length]
+        if kind == 0x4E4F534A:
+            gltf = json.loads(chunk)
+        elif kind == 0x004E4942:
+            binary = bytearray(chunk)
+        position += 8 + length
+    return gltf, binary
+
+def write_glb(path, gltf, binary):
+    """Write a .glb file from its JSON and its binary chunk."""
+    content = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    content += b' ' * (-len(content) % 4)
+    binary = bytes(binary) + b'\0' * (-len(binary) % 4)
+    with open(path, 'wb') as file:
+        file.write(struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(content) + 8 + len(binary)))
+        file.write(struct.pack('<II', len(content), 0x4E4F534A) + content)
+        file.write(struct.pack('<II', len(binary), 0x004E4942) + binary)
+
+def add_accessor(gltf, binary, array, kind):
+    """Append a float32 array to the binary chunk, return the index of its accessor."""
+    data = np.ascontiguousarray(array, dtype=np.float32).tobytes()
+    binary.extend(b'\0' * (-len(binary) % 4))
+    gltf["bufferViews"].append({"buffer": 0, "byteOffset": len(binary), "byteLength": len(data)})
+    binary.extend(data)
+    accessor = {"bufferView": len(gltf["bufferViews"]) - 1, "componentType": 5126, "count": len(array), "type": kind}
+    if kind == "SCALAR":
+        accessor["min"] = [float(np.min(array))]
+        accessor["max"] = [float(np.max(array))]
+    gltf["accessors"].append(accessor)
+    return len(gltf["accessors"]) - 1
+
+def export_gltf(layout, tracks, path, fps=compiler.FPS, avatar=None):
+    """
+    Write the baked tracks as the animations of a .glb file.
+
+    A constant channel is written with a single sample.
+
+    Args:
+        layout (list): The channels returned by `bake_animations`.
+        tracks (list): The tracks returned by `bake_animations`.
+        path (str): Path to the .glb file.
+        fps (int, optional): Frame rate of the tracks. Defaults to FPS.
+        avatar (str, optional): Path to the .glb avatar whose nodes are animated. Not used if None.
+
+    Returns:
+        int: The number of animation channels written.
+    """
+    require_numpy()
+    if avatar:
+        gltf, binary = read_glb(avatar)
+    else:
+        bones = list(dict.fromkeys(bone for bone, _, _, _ in layout))
+        gltf = {"asset": {"version": "2.0"}, "scene": 0, "scenes": [{"nodes": list(range(len(bones)))}],
+                "nodes": [{"name": bone} for bone in bones]}
+        binary = bytearray()
+    gltf.setdefault("bufferViews", [])
+    gltf.setdefault("accessors", [])
+    gltf.setdefault("animations", [])
+    nodes = {node.get("name"): index for index, node in enumerate(gltf["nodes"])}
+    # The channels of each path, for all the bones at once, with the rest transforms of their nodes
+    groups = []
+    for blender_path in HAND_PATHS:
+        channels = [(bone, column, width) for bone, path, column, width in layout if path == blender_path and bone in nodes]
+        if not channels:
+            continue
+        rest = [gltf["nodes"][nodes[bone]] for bone, _, _ in channels]
+        groups.append((blender_path, [nodes[bone] for bone, _, _ in channels],
+                       np.array([np.arange(column, column + width) for _, column, width in channels]),
+                       np.array([node.get("translation", (0.0, 0.0, 0.0)) for node in rest]),
+                       np.array([node.get("rotation", (0.0, 0.0, 0.0, 1.0)) for node in rest])[:, [3, 0, 1, 2]],
+                       np.array([node.get("scale", (1.0, 1.0, 1.0)) for node in rest])))
+    count = 0
+    for name, start, values in tracks:
+        times = (np.arange(start, start + len(values)) - 1) / fps
+        inputs = None
+        constant = None
+        samplers = []
+        channels = []
+        for blender_path, targets, columns, translation, rotation, scale in groups:
+            tracks_path = values[:, columns].astype(np.float64)
+            if blender_path == 'rotation_quaternion':
+                tracks_path = quaternion_multiply(rotation, tracks_path)
+                tracks_path = (tracks_path / np.linalg.norm(tracks_path, axis=-1, keepdims=True))[..., [1, 2, 3, 0]]
+            elif blender_path == 'location':
+                tracks_path = translation + quaternion_rotate(np.broadcast_to(rotation, tracks_path.shape[:-1] + (4,)),
+                                                              scale * tracks_path)
+            else:
+                tracks_path = scale * tracks_path
+            kind = "VEC4" if tracks_path.shape[-1] == 4 else "VEC3"
+            constants = np.all(tracks_path == tracks_path[:1], axis=(0, 2))
+            for index, node in enumerate(targets):
+                if constants[index]:
+                    if constant is None:
+                        constant = add_accessor(gltf, binary, times[:1], "SCALAR")
+                    sampler_input, track = constant, tracks_path[:1, index]
+                else:
+                    if inputs is None:
+                        inputs = add_accessor(gltf, binary, times, "SCALAR")
+                    sampler_input, track = inputs, tracks_path[:, index]
+                samplers.append({"input": sampler_input, "output": add_accessor(gltf, binary, track, kind),
+                                 "interpolation": "LINEAR"})
+                channels.append({"sampler": len(samplers) - 1, "target": {"node": node, "path": GLTF_PATHS[blender_path]}})
+        gltf["animations"].append({"name": name, "samplers": samplers, "channels": channels})
+        count += len(channels)
+    gltf.setdefault("buffers", [{}])[0]["byteLength"] = len(binary) + (-len(binary) % 4)
+    write_glb(path, gltf, binary)
+    return count
+
+# ----------------------------------------------------------------
+# PARITY
+# The "Export Baked Tracks" button of the plug-in samples the F-Curves of the animations created in
+# Blender: {"fps", "signs": {name: {"start", "channels": {"bone/path": [[values] per frame]}}}}.
+
+def compare_tracks(layout, tracks, reference, tolerance=TOLERANCE):
+    """
+    Compare baked tracks with the tracks exported from Blender.
+
+    Args:
+        layout (list): The channels returned by `bake_animations`.
+        tracks (list): The tracks returned by `bake_animations`.
+        reference (dict): The tracks exported by the plug-in.
+        tolerance (float, optional): Maximum difference of a channel value. Defaults to TOLERANCE.
+
+    Returns:
+        dict: The report {"signs", "error", "failed", "missing"}, where error is the largest difference,
+              failed gives {"sign", "channel", "error"} or {"sign", "message"}, and missing lists the signs
+              of the reference that were not baked.
+    """
+    baked = {name: (start, values) for name, start, values in tracks}
+    failed = []
+    largest = 0.0
+    for name, sign in reference["signs"].items():
+        if name not in baked:
+            continue
+        start, values = baked[name]
+        frames = len(next(iter(sign["channels"].values()), []))
+        if sign["start"] != start or frames != len(values):
+            failed.append({"sign": name, "message": f"frames {sign['start']}-{sign['start'] + frames - 1}, "
+                                                   f"baked {start}-{start + len(values) - 1}"})
+            continue
+        for bone, path, column, width in layout:
+            channel = f"{bone}/{path}"
+            if channel not in sign["channels"]:
+                continue
+            error = float(np.max(np.abs(np.asarray(sign["channels"][channel]) - values[:, column:column + width])))
+            largest = max(largest, error)
+            if error > tolerance:
+                failed.append({"sign": name, "channel": channel, "error": error})
+    return {
+        "signs": len([name for name in reference["signs"] if name in baked]),
+        "error": largest,
+        "failed": failed,
+        "missing": [name for name in reference["signs"] if name not in baked]
+    }
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Bake the animations without Blender into a glTF file.")
+    arg_parser.add_argument('database', help="database.json, database.ir.json or database.pool.json")
+    arg_parser.add_argument('output', nargs='?', help="Output .glb file")
+    arg_parser.add_argument('--constants', default=CONSTANTS_JSON, help="constants.json of the plug-in")
+    arg_parser.add_argument('--hand-poses', default=HAND_TABLE, help="Hand pose table exported by the plug-in")
+    arg_parser.add_argument('--avatar', default=AVATAR_GLB, help="Avatar .glb whose nodes are animated ('' for bones only)")
+    arg_parser.add_argument('--spacing', type=int, default=compiler.KEYFRAME_SPACING, help="Pose Duration of the plug-in, in frames")
+    arg_parser.add_argument('--fps', type=int, default=compiler.FPS, help="Frame rate of the baked animations")
+    arg_parser.add_argument('--batch', type=int, default=BATCH_SIGNS, help="Number of signs sampled together")
+    arg_parser.add_argument('--compare', metavar='TRACKS', help="Tracks exported from Blender, to check the parity")
+    arg_parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="Tolerance of the parity check")
+    args = arg_parser.parse_args()
+
+    with open(args.database, 'r') as file:
+        data = json.load(file)
+    # database.ir.json and database.pool.json are expanded, database.json already is
+    if isinstance(data, dict) or any("body" in animation for entry in data for animation in entry.values()):
+        data = compiler.expand_animations(compiler.resolve_pool(data) if isinstance(data, dict) else data)
+    layout, tracks, report = bake_animations(data, load_constants(args.constants), load_hand_table(args.hand_poses),
+                                             args.spacing, args.batch)
+    for problem in report['skipped']:
+        print(f"{problem['sign']}: {problem['message']}")
+    print(f"{report['baked']} of {report['signs']} signs baked, {report['frames']} frames in {report['duration']:.2f}s")
+    if args.output:
+        start = time.perf_counter()
+        channels = export_gltf(layout, tracks, args.output, args.fps, args.avatar or None)
+        print(f"{channels} channels written to {args.output} in {time.perf_counter() - start:.2f}s")
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            parity = compare_tracks(layout, tracks, json.load(file), args.tolerance)
+        for problem in parity['failed'][:20]:
+            if 'message' in problem:
+                print(f"{problem['sign']}: {problem['message']}")
+            else:
+                print(f"{problem['sign']}: {problem['channel']} differs by {problem['error']:.6f}")
+        if parity['missing']:
+            print(f"Not baked: {', '.join(parity['missing'])}")
+        print(f"{parity['signs']} signs compared, largest difference {parity['error']:.6f}, {len(parity['failed'])} failed")
+        if parity['failed']:
+            raise SystemExit(1)
@@ -0,0 +1,400 @@
+# benchmark.py
+import argparse
+import contextlib
+import os
+import glob
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from database import main_database, auto_indentate, auto_indentate_legacy
+from build import main_build
+import compiler
+
+# ----------------------------------------------------------------
+# SYNTHETIC DATABASE GENERATOR
+
+HAND_POSES = ['P1', 'P2', 'P3', 'A', 'B', 'C', 'D', 'L', 'O', 'V', 'Y']
+
+def random_vector(rng):
+    return '[' + ', '.join(f"{rng.uniform(-1, 1):.2f}" for _ in range(3)) + ']'
+
+def random_pose(rng):
+    right = f"{{R_{rng.choice(HAND_POSES)}, {random_vector(rng)}, {random_vector(rng)}, {random_vector(rng)}}}"
+    left = f"{{L_{rng.choice(HAND_POSES)}, {random_vector(rng)}, {random_vector(rng)}, {random_vector(rng)}}}"
+    return f"{right} - {left}"
+
+def random_script(rng, poses=8, repeat=0.2, speed=0.2, depth=1):
+    items = []
+    while len(items) < poses:
+        roll = rng.random()
+        if depth > 0 and roll < repeat:
+            inner = random_script(rng, max(1, poses // 4), repeat, speed, depth - 1)
+            items.append(f"REPEAT({rng.randint(2, 4)}, {inner})")
+        elif depth > 0 and roll < repeat + speed:
+            inner = random_script(rng, max(1, poses // 4), repeat, speed, depth - 1)
+            items.append(f"SPEED({rng.randint(2, 4)}, {inner})")
+        else:
+            items.append(random_pose(rng))
+    return ', '.join(items)
+
+def generate_data(signs, seed=0, poses=8, repeat=0.2, speed=0.2, depth=1):
+    """
+    Generate a synthetic database with the same structure as `clean_database`.
+
+    Args:
+        signs (int): Number of signs.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        poses (int, optional): Number of top-level items (poses or blocks) per script. Defaults to 8.
+        repeat (float, optional): Probability of a REPEAT block for each item. Defaults to 0.2.
+        speed (float, optional): Probability of a SPEED block for each item. Defaults to 0.2.
+        depth (int, optional): Maximum nesting of REPEAT/SPEED blocks. Defaults to 1.
+
+    Returns:
+        dict: The synthetic database.
+    """
+    rng = random.Random(seed)
+    data = {}
+    for i in range(signs):
+        data[i] = {
+            'name': f"Sign {i}",
+            'face': 'N',
+            'script': random_script(rng, poses, repeat, speed, depth) + '.',
+            'arms': f"SIGN_{i}"
+        }
+    return data
+
+def database_text(data):
+    """Join the synthetic scripts into a database text without formatting them."""
+    return ''.join(f"({value['arms']})\n\n{value['script']}\n\n" for value in data.values())
+
+# ----------------------------------------------------------------
+# BENCHMARKS
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def benchmark_verbosity(signs, seed=0):
+    """
+    Compare the compile time of `main_compiler` in DEBUG and QUIET modes.
+
+    In DEBUG mode the output is written to os.devnull, so the measure is a lower bound
+    of the cost of printing to a terminal.
+    """
+    data = generate_data(signs, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        database_txt = os.path.join(directory, 'database.txt')
+        database_json = os.path.join(directory, 'database.json')
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            main_database(data, database_txt)
+            debug_time, _ = timed(compiler.main_compiler, database_txt, database_json, verbosity=compiler.DEBUG)
+        quiet_time, report = timed(compiler.main_compiler, database_txt, database_json, verbosity=compiler.QUIET)
+    print(f"{signs:>8} signs | {report['poses']:>9} poses | debug {debug_time:8.3f}s | quiet {quiet_time:8.3f}s | x{debug_time / quiet_time:.2f}")
+    return {"signs": signs, "poses": report['poses'], "debug": debug_time, "quiet": quiet_time}
+
+def benchmark_scaling(counts, seed=0):
+    """
+    Measure the parse time of growing databases, and of one animation with a growing number of poses.
+
+    With a linear parser the time per animation and per pose stays constant.
+    """
+    results = {"animations": [], "poses": []}
+    for count in counts:
+        text = database_text(generate_data(count, seed, poses=4, repeat=0, speed=0))
+        duration, _ = timed(compiler.parse_input, text, verbosity=compiler.QUIET)
+        print(f"{count:>8} animations | {duration:8.3f}s | {duration / count * 1e6:8.1f} us/animation")
+        results["animations"].append({"count": count, "time": duration})
+    rng = random.Random(seed)
+    for count in counts:
+        text = "(LONG)\n\n" + ', '.join(random_pose(rng) for _ in range(count)) + '.'
+        duration, _ = timed(compiler.parse_input, text, verbosity=compiler.QUIET)
+        print(f"{count:>8} poses      | {duration:8.3f}s | {duration / count * 1e6:8.1f} us/pose")
+        results["poses"].append({"count": count, "time": duration})
+    return results
+
+def benchmark_parsers(signs, seed=0):
+    """
+    Compare the PLY and recursive-descent parsers on the same database and check that their outputs are identical.
+    """
+    text = database_text(generate_data(signs, seed, depth=2))
+    outputs = {}
+    for name in (compiler.PLY, compiler.RD):
+        duration, result = timed(compiler.parse_input, text, verbosity=compiler.QUIET, parser=name)
+        outputs[name] = json.dumps(result)
+        print(f"{signs:>8} signs | {name:>3} | {duration:8.3f}s")
+    equal = outputs[compiler.PLY] == outputs[compiler.RD]
+    print(f"Outputs identical: {equal}")
+    return equal
+
+def benchmark_workers(signs, workers, seed=0):
+    """
+    Measure the parse time of one database with a growing number of processes.
+    """
+    text = database_text(generate_data(signs, seed))
+    results = []
+    reference = None
+    for count in workers:
+        duration, output = timed(compiler.parse_input, text, verbosity=compiler.QUIET, workers=count)
+        reference = reference or output
+        print(f"{signs:>8} signs | {count:>3} workers | {duration:8.3f}s | identical {output == reference}")
+        results.append({"workers": count, "time": duration})
+    return results
+
+def benchmark_formatter(counts, seed=0):
+    """
+    Compare `auto_indentate` with the legacy formatter on long REPEAT-heavy scripts, and check that their outputs are identical.
+    """
+    rng = random.Random(seed)
+    results = []
+    for count in counts:
+        script = ', '.join(random_script(rng, poses=8, repeat=0.4, speed=0.2, depth=2) for _ in range(count)) + '.'
+        legacy_time, legacy = timed(auto_indentate_legacy, script)
+        new_time, formatted = timed(auto_indentate, script)
+        print(f"{len(script):>10} chars | legacy {legacy_time:8.3f}s | linear {new_time:8.3f}s | x{legacy_time / new_time:.1f} | identical {formatted == legacy}")
+        results.append({"chars": len(script), "legacy": legacy_time, "linear": new_time, "identical": formatted == legacy})
+    return results
+
+def legacy_poses(body):
+    """Expand an IR body with the original builders: REPEAT multiplies the list and SPEED sets the speed in place."""
+    poses = []
+    for node in body:
+        if 'RH' in node:
+            poses.append(dict(node, speed=1))
+        elif 'repeat' in node:
+            poses.extend(legacy_poses(node['body']) * node['repeat'])
+        else:
+            inner = legacy_poses(node['body'])
+            for pose in inner:
+                pose['speed'] = node['speed']
+            poses.extend(inner)
+    return poses
+
+def benchmark_ir(signs, seed=0, repeat=0.4):
+    """
+    Compare the size and load time of the IR, of the pool of interned poses and of the expanded database,
+    and check the expansion: same keyframes as the original builders, and one dictionary per keyframe (no aliasing).
+    """
+    text = database_text(generate_data(signs, seed, repeat=repeat, depth=2))
+    with compiler.compilation(compiler.QUIET):
+        program = compiler.parse_animations(text, ir=True)
+    pool, stats = compiler.intern_animations(program)
+    outputs = {"ir": compiler.dump_database(program),
+               "pool": compiler.dump_database(pool),
+               "expanded": compiler.dump_database(compiler.expand_animations(program))}
+    loads = {label: timed(json.loads, output)[0] for label, output in outputs.items()}
+    valid = True
+    for entry in program:
+        for animation in entry.values():
+            poses = list(compiler.expand(animation['body']))
+            valid = valid and poses == legacy_poses(animation['body']) and len({id(pose) for pose in poses}) == len(poses)
+    valid = valid and compiler.expand_animations(compiler.resolve_pool(json.loads(outputs["pool"]))) == json.loads(outputs["expanded"])
+    print(f"{signs:>8} signs | " + " | ".join(f"{label} {len(output):>10} bytes, load {loads[label]:6.3f}s"
+                                            for label, output in outputs.items())
+          + f" | {stats['ratio']:.2f} keyframes per pose | expansion valid {valid}")
+    return {"signs": signs, "sizes": {label: len(output) for label, output in outputs.items()}, "load": loads,
+            "dedup": stats, "valid": valid}
+
+def benchmark_cold_start(runs=3):
+    """
+    Measure the time to import the compiler and parse one sign in a new interpreter,
+    without and with the LALR tables persisted in __pycache__.
+    """
+    script = "import compiler; compiler.parse_input('(A)\\n\\n{R_A, [0, 0, 0], [0, 0, 0], [0, 0, 0]} - {L_A, [0, 0, 0], [0, 0, 0], [0, 0, 0]}.', verbosity=compiler.QUIET)"
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for label, clear in (("no tables", True), ("cached tables", False)):
+        durations = []
+        for _ in range(runs):
+            if clear:
+                for path in glob.glob(os.path.join(compiler.TABLES_DIR, 'parsetab_*.pickle')):
+                    os.remove(path)
+            duration, _ = timed(subprocess.run, [sys.executable, '-c', script], cwd=directory, check=True)
+            durations.append(duration)
+        results[label] = min(durations)
+        print(f"{label:>13} | {results[label]:8.3f}s")
+    return results
+
+# ----------------------------------------------------------------
+# BENCHMARK SUITE
+# Time, peak memory and output size of each stage of the compiler on synthetic databases,
+# stored as JSON so a run can be compared with a previous one
+
+def measure(memory, function, *args, **kwargs):
+    """
+    Run a function and measure it.
+
+    The peak memory is measured in a second run with tracemalloc, which would slow down the timed run.
+
+    Returns:
+        tuple: The result of the function, and {"time", "peak"} with the peak in bytes (None if not measured).
+    """
+    duration, result = timed(function, *args, **kwargs)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {"time": duration, "peak": peak}
+
+def format_database(data, output_file):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        main_database(data, output_file)
+    with open(output_file, 'r') as file:
+        return file.read()
+
+def parse_database(text):
+    with compiler.compilation(compiler.QUIET):
+        return compiler.parse_animations(text)
+
+def benchmark_suite(counts, seed=0, poses=8, repeat=0.2, speed=0.2, depth=1, memory=True):
+    """
+    Measure the stages of the compiler on synthetic databases of growing sizes.
+
+    The stages are the formatter (`main_database`), the parser (`parse_animations`), the JSON
+    encoder (`dump_database`) and a full incremental build (`main_build`, empty cache).
+
+    Args:
+        counts (list): Numbers of signs.
+        seed, poses, repeat, speed, depth: Parameters of `generate_data`.
+        memory (bool, optional): Also measure the peak memory of each stage. Defaults to True.
+
+    Returns:
+        dict: The configuration, the environment and the measures of each database size.
+    """
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"seed": seed, "poses": poses, "repeat": repeat, "speed": speed, "depth": depth},
+        "runs": []
+    }
+    for count in counts:
+        data = generate_data(count, seed, poses, repeat, speed, depth)
+        stages = {}
+        with tempfile.TemporaryDirectory() as directory:
+            text, stages["format"] = measure(memory, format_database, data, os.path.join(directory, 'database.txt'))
+            animations, stages["parse"] = measure(memory, parse_database, text)
+            output, stages["encode"] = measure(memory, compiler.dump_database, animations)
+            def build():
+                cache_file = os.path.join(directory, 'build.sqlite3')
+                if os.path.exists(cache_file):
+                    os.remove(cache_file)
+                return main_build(data, os.path.join(directory, 'database.json'), None, cache_file,
+                                  os.path.join(directory, 'manifest.json'), resilient=True)
+            manifest, stages["build"] = measure(memory, build)
+        run = {
+            "signs": count,
+            "keyframes": sum(len(animation["poses"]) for entry in animations for animation in entry.values()),
+            "sizes": {"database.txt": len(text.encode('utf-8')), "database.json": len(output.encode('utf-8'))},
+            "stages": stages
+        }
+        results["runs"].append(run)
+        print(f"{count:>8} signs | {run['keyframes']:>9} keyframes | txt {run['sizes']['database.txt']:>11} bytes | "
+              f"json {run['sizes']['database.json']:>11} bytes")
+        for name, stage in stages.items():
+            peak = f"{stage['peak'] / 2**20:9.1f} MiB" if stage['peak'] is not None else ""
+            print(f"{'':>8} {name:<8} {stage['time']:8.3f}s {peak}")
+    return results
+
+def compare_results(baseline, current, threshold=1.2):
+    """
+    Compare two results of `benchmark_suite` with the same configuration.
+
+    Args:
+        baseline (dict): The reference results.
+        current (dict): The new results.
+        threshold (float, optional): Ratio of time, peak memory or output size above which a measure is a regression.
+
+    Returns:
+        list: Description of each regression, empty if there is none.
+    """
+    regressions = []
+    if baseline["config"] != current["config"]:
+        print(f"Warning: different configurations {baseline['config']} and {current['config']}")
+    runs = {run["signs"]: run for run in baseline["runs"]}
+    for run in current["runs"]:
+        reference = runs.get(run["signs"])
+        if reference is None:
+            continue
+        measures = [(f"{name} time", stage["time"], reference["stages"][name]["time"]) for name, stage in run["stages"].items()
+                    if name in reference["stages"]]
+        measures += [(f"{name} peak", stage["peak"], reference["stages"][name]["peak"]) for name, stage in run["stages"].items()
+                     if name in reference["stages"] and stage["peak"] and reference["stages"][name]["peak"]]
+        measures += [(f"{name} size", size, reference["sizes"][name]) for name, size in run["sizes"].items()
+                     if name in reference["sizes"]]
+        for label, value, previous in measures:
+            ratio = value / previous if previous else 1.0
+            status = "REGRESSION" if ratio > threshold else ""
+            print(f"{run['signs']:>8} signs | {label:<20} x{ratio:6.2f} {status}")
+            if ratio > threshold:
+                regressions.append(f"{run['signs']} signs: {label} x{ratio:.2f}")
+    return regressions
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark the animation compiler.")
+    arg_parser.add_argument('--signs', type=int, nargs='+', default=[100, 1000, 5000], help="Database sizes")
+    arg_parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic databases")
+    arg_parser.add_argument('--scaling', type=int, nargs='*', default=None,
+                            help="Run the parser scaling benchmark (default sizes: 100 to 50000)")
+    arg_parser.add_argument('--parsers', action='store_true', help="Compare the PLY and recursive-descent parsers")
+    arg_parser.add_argument('--formatter', type=int, nargs='*', default=None,
+                            help="Compare the formatters on long scripts (default sizes: 100 to 5000 segments)")
+    arg_parser.add_argument('--suite', type=int, nargs='*', default=None,
+                            help="Run the benchmark suite (default sizes: 1000, 10000 and 100000 signs)")
+    arg_parser.add_argument('--poses', type=int, default=8, help="Suite: number of top-level items per script")
+    arg_parser.add_argument('--repeat', type=float, default=0.2, help="Suite: probability of a REPEAT block")
+    arg_parser.add_argument('--speed', type=float, default=0.2, help="Suite: probability of a SPEED block")
+    arg_parser.add_argument('--depth', type=int, default=1, help="Suite: maximum nesting of REPEAT/SPEED blocks")
+    arg_parser.add_argument('--no-memory', action='store_true', help="Suite: do not measure the peak memory")
+    arg_parser.add_argument('--output', help="Suite: JSON file of the results")
+    arg_parser.add_argument('--baseline', help="Suite: JSON results to compare with, exits with 1 on a regression")
+    arg_parser.add_argument('--threshold', type=float, default=1.2, help="Suite: ratio above which a measure is a regression")
+    arg_parser.add_argument('--ir', action='store_true', help="Compare the IR and the pool of interned poses with the expanded database")
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=None, help="Compare numbers of processes")
+    args = arg_parser.parse_args()
+
+    if args.suite is not None:
+        print("Benchmark suite")
+        results = benchmark_suite(args.suite or [1000, 10000, 100000], args.seed, args.poses, args.repeat,
+                                  args.speed, args.depth, not args.no_memory)
+        if args.output:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=4)
+        if args.baseline:
+            with open(args.baseline, 'r') as file:
+                regressions = compare_results(json.load(file), results, args.threshold)
+            print(f"{len(regressions)} regressions")
+            if regressions:
+                sys.exit(1)
+    elif args.scaling is not None:
+        print("Parser scaling")
+        benchmark_scaling(args.scaling or [100, 1000, 10000, 50000], args.seed)
+    elif args.formatter is not None:
+        print("Formatter")
+        benchmark_formatter(args.formatter or [100, 500, 1000, 5000], args.seed)
+    elif args.ir:
+        print("Intermediate representation")
+        for signs in args.signs:
+            benchmark_ir(signs, args.seed)
+    elif args.workers:
+        print("Processes")
+        for signs in args.signs:
+            benchmark_workers(signs, args.workers, args.seed)
+    elif args.parsers:
+        print("Parsers")
+        for signs in args.signs:
+            benchmark_parsers(signs, args.seed)
+        print("Cold start")
+        benchmark_cold_start()
+    else:
+        print("Compile time by verbosity")
+        for signs in args.signs:
+            benchmark_verbosity(signs, args.seed)
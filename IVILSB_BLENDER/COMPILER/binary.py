@@ -0,0 +1,281 @@
+# binary.py
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# ----------------------------------------------------------------
+# FORMAT
+#
+# Little-endian container, every section is aligned on 8 bytes:
+#   header      magic, version, counts and the offset of each section
+#   strings     (strings + 1) uint32 offsets, then the UTF-8 bytes of the strings
+#   index       (signs, 3) uint32: name string, first pose, number of poses
+#   order       (signs) uint32: index entries sorted by name, for the lookup by name
+#   hands       (poses, 2) uint32: right and left hand pose strings
+#   vectors     (poses, 6, 3) float32: R1, R2, R3, L1, L2, L3
+#   speeds      (poses) float32
+
+MAGIC = b'IVLA'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII7Q')
+VECTORS = ('R1', 'R2', 'R3', 'L1', 'L2', 'L3')
+
+def align(offset):
+    return (offset + 7) & ~7
+
+# ----------------------------------------------------------------
+# WRITER
+
+def write_binary(animations, output_file):
+    """
+    Write compiled animations into the binary container.
+
+    Args:
+        animations (list): One {name: animation} dictionary per animation, as in database.json.
+        output_file (str): Path to the binary file.
+
+    Returns:
+        int: Size of the file in bytes.
+    """
+    strings = {}
+    def string_id(value):
+        return strings.setdefault(value, len(strings))
+
+    index = array('I')
+    hands = array('I')
+    vectors = array('f')
+    speeds = array('f')
+    names = []
+    pose_count = 0
+    for entry in animations:
+        for animation in entry.values():
+            poses = animation['poses']
+            names.append(animation['name'])
+            index.extend((string_id(animation['name']), pose_count, len(poses)))
+            for pose in poses:
+                hands.extend((string_id(pose['RH']), string_id(pose['LH'])))
+                for key in VECTORS:
+                    vectors.extend(pose[key])
+                speeds.append(pose.get('speed', 1))
+            pose_count += len(poses)
+    order = array('I', sorted(range(len(names)), key=lambda i: names[i]))
+    if sys.byteorder == 'big':
+        for values in (index, order, hands, vectors, speeds):
+            values.byteswap()
+
+    encoded = [value.encode('utf-8') for value in strings]
+    string_offsets = [0]
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    sections = [struct.pack(f'<{len(string_offsets)}I', *string_offsets) + b''.join(encoded), index.tobytes(),
+                order.tobytes(), hands.tobytes(), vectors.tobytes(), speeds.tobytes()]
+
+    offsets = []
+    offset = align(HEADER.size)
+    for section in sections:
+        offsets.append(offset)
+        offset = align(offset + len(section))
+    with open(output_file, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(strings), len(names), pose_count, *offsets, offset))
+        for section_offset, section in zip(offsets, sections):
+            file.write(b'\0' * (section_offset - file.tell()))
+            file.write(section)
+        file.write(b'\0' * (offset - file.tell()))
+    return offset
+
+# ----------------------------------------------------------------
+# READER
+
+class AnimationPack:
+    """
+    Read the binary container through a memory map.
+
+    Only the header is read when the file is opened; `get` reads the index entries
+    needed by a binary search on the names, then the poses of the sign.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.string_count, self.sign_count, self.pose_count,
+         self.strings_offset, self.index_offset, self.order_offset, self.hands_offset,
+         self.vectors_offset, self.speeds_offset, size) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an animation container")
+        if version != VERSION:
+            raise ValueError(f"Unsupported animation container version {version}")
+        if size != len(self.data):
+            raise ValueError(f"Truncated animation container ({len(self.data)} of {size} bytes)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.sign_count
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def string(self, string_id):
+        start, end = struct.unpack_from('<II', self.data, self.strings_offset + 4 * string_id)
+        base = self.strings_offset + 4 * (self.string_count + 1)
+        return self.data[base + start:base + end].decode('utf-8')
+
+    def name(self, position):
+        """Return the name of the sign at a position of the database."""
+        return self.string(struct.unpack_from('<I', self.data, self.index_offset + 12 * position)[0])
+
+    def names(self):
+        """Return the names of all the signs, in the order of the database."""
+        return [self.name(position) for position in range(self.sign_count)]
+
+    def find(self, name):
+        """
+        Find a sign by name with a binary search on the sorted order.
+
+        Returns:
+            int or None: The position of the first sign with this name, or None.
+        """
+        keys = _Keys(self)
+        index = bisect.bisect_left(keys, name)
+        if index < self.sign_count and keys[index] == name:
+            return keys.position(index)
+        return None
+
+    def animation(self, position):
+        """Return the animation at a position of the database, in the same form as in database.json."""
+        name_id, first, count = struct.unpack_from('<III', self.data, self.index_offset + 12 * position)
+        hands = struct.unpack_from(f'<{2 * count}I', self.data, self.hands_offset + 8 * first)
+        vectors = struct.unpack_from(f'<{18 * count}f', self.data, self.vectors_offset + 72 * first)
+        speeds = struct.unpack_from(f'<{count}f', self.data, self.speeds_offset + 4 * first)
+        poses = []
+        for i in range(count):
+            pose = {'RH': self.string(hands[2 * i])}
+            for j, key in enumerate(VECTORS):
+                if key == 'L1':
+                    pose['LH'] = self.string(hands[2 * i + 1])
+                start = 18 * i + 3 * j
+                pose[key] = list(vectors[start:start + 3])
+            speed = speeds[i]
+            pose['speed'] = int(speed) if speed.is_integer() else speed
+            poses.append(pose)
+        return {"name": self.string(name_id), "poses": poses}
+
+    def get(self, name):
+        """
+        Return the animation of a sign without reading the other signs.
+
+        Returns:
+            dict or None: The animation, or None if there is no sign with this name.
+        """
+        position = self.find(name)
+        return self.animation(position) if position is not None else None
+
+    def animations(self):
+        """Return all the animations, in the same form as database.json."""
+        result = []
+        for position in range(self.sign_count):
+            animation = self.animation(position)
+            result.append({animation['name']: animation})
+        return result
+
+class _Keys:
+    """Sequence of the sign names in sorted order, read on demand by `bisect`."""
+
+    def __init__(self, pack):
+        self.pack = pack
+
+    def __len__(self):
+        return self.pack.sign_count
+
+    def __getitem__(self, index):
+        return self.pack.name(self.position(index))
+
+    def position(self, index):
+        return struct.unpack_from('<I', self.pack.data, self.pack.order_offset + 4 * index)[0]
+
+# ----------------------------------------------------------------
+# ROUND-TRIP CHECK
+
+def compare_animations(expected, actual, tolerance=1e-6):
+    """
+    Compare animations read from JSON and from the binary container.
+
+    The vectors and the speeds are compared with a relative tolerance, because they are stored as float32.
+
+    Returns:
+        list: Description of each difference, empty if the animations are the same.
+    """
+    def close(x, y):
+        return abs(x - y) <= tolerance * max(1.0, abs(x))
+
+    differences = []
+    if len(expected) != len(actual):
+        differences.append(f"{len(expected)} animations expected, {len(actual)} found")
+    for position, (expected_entry, actual_entry) in enumerate(zip(expected, actual)):
+        (name, animation), = expected_entry.items()
+        other = actual_entry.get(name)
+        if other is None:
+            differences.append(f"#{position}: {name} not found")
+            continue
+        if len(animation['poses']) != len(other['poses']):
+            differences.append(f"{name}: {len(animation['poses'])} poses expected, {len(other['poses'])} found")
+            continue
+        for i, (pose, other_pose) in enumerate(zip(animation['poses'], other['poses'])):
+            for key in ('RH', 'LH'):
+                if pose[key] != other_pose[key]:
+                    differences.append(f"{name} pose {i}: {key} {pose[key]} != {other_pose[key]}")
+            if not close(pose.get('speed', 1), other_pose['speed']):
+                differences.append(f"{name} pose {i}: speed {pose.get('speed', 1)} != {other_pose['speed']}")
+            for key in VECTORS:
+                for x, y in zip(pose[key], other_pose[key]):
+                    if not close(x, y):
+                        differences.append(f"{name} pose {i}: {key} {pose[key]} != {other_pose[key]}")
+                        break
+    return differences
+
+def verify_binary(json_file, binary_file):
+    """
+    Check that a binary container holds the same animations as a JSON database.
+
+    Args:
+        json_file (str): Path to database.json.
+        binary_file (str): Path to the binary container.
+
+    Returns:
+        list: Description of each difference, empty if the files hold the same animations.
+    """
+    with open(json_file, 'r') as file:
+        expected = json.load(file)
+    with AnimationPack(binary_file) as pack:
+        differences = compare_animations(expected, pack.animations())
+        # The lookup by name must find the first animation of each name
+        for entry in expected:
+            for name, animation in entry.items():
+                found = pack.get(name)
+                if found is None or found['name'] != name:
+                    differences.append(f"{name}: not found by name")
+    return differences
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Convert database.json to the binary animation container.")
+    arg_parser.add_argument('input', help="database.json")
+    arg_parser.add_argument('output', help="Binary container")
+    args = arg_parser.parse_args()
+
+    with open(args.input, 'r') as file:
+        size = write_binary(json.load(file), args.output)
+    differences = verify_binary(args.input, args.output)
+    print(f"{args.output}: {size} bytes ({os.path.getsize(args.input)} bytes of JSON)")
+    print("Round-trip check: " + ("OK" if not differences else f"{len(differences)} differences"))
+    for difference in differences[:20]:
+        print(difference)
@@ -0,0 +1,307 @@
+# build.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import compiler
+from binary import write_binary
+from database import IDLE_BLOCK, format_block
+
+# ----------------------------------------------------------------
+# BUILD CACHE
+
+# Source files whose changes invalidate every cached block: the formatter, the compiler,
+# the build itself (formatting fallback, output assembly) and the binary writer
+TOOLCHAIN_FILES = ('compiler.py', 'database.py', 'build.py', 'binary.py')
+
+def toolchain_hash():
+    """Hash the toolchain sources, so a change of the toolchain rebuilds every sign."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in TOOLCHAIN_FILES:
+        with open(os.path.join(directory, name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def block_hash(toolchain, arms, script):
+    """Hash the content of one animation block."""
+    content = '\0'.join([toolchain, arms, script])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+# Version of the tables of the build cache, a cache with another version is recreated
+CACHE_VERSION = 4
+
+class BuildCache:
+    """
+    SQLite cache of the compiled animation blocks, and of the list of signs of the last build.
+
+    The blocks are addressed by their content hash, so identical scripts are compiled once.
+    They are stored in the intermediate representation, with the REPEAT and SPEED blocks unexpanded,
+    and remember whether they only compiled after formatting.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            if self.connection.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS blocks")
+                self.connection.execute("DROP TABLE IF EXISTS signs")
+                self.connection.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS blocks ("
+                "hash TEXT PRIMARY KEY, "
+                "animations TEXT NOT NULL, "
+                "poses INTEGER NOT NULL, "
+                "normalized INTEGER NOT NULL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS signs ("
+                "position INTEGER PRIMARY KEY, "
+                "arms TEXT NOT NULL, "
+                "hash TEXT NOT NULL)"
+            )
+
+    def get_block(self, block_id):
+        row = self.connection.execute(
+            "SELECT animations, poses, normalized FROM blocks WHERE hash = ?", (block_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"animations": json.loads(row[0]), "poses": row[1], "normalized": bool(row[2])}
+
+    def put_blocks(self, blocks):
+        """Store (hash, block) pairs in one transaction."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO blocks (hash, animations, poses, normalized) VALUES (?, ?, ?, ?)",
+                [(block_id, json.dumps(block["animations"]), block["poses"], int(block["normalized"]))
+                 for block_id, block in blocks]
+            )
+
+    def signs(self):
+        """Return the (arms, hash) pairs of the last successful build, in order."""
+        return self.connection.execute("SELECT arms, hash FROM signs ORDER BY position").fetchall()
+
+    def save_signs(self, signs):
+        """Replace the signs of the last build and delete the blocks they no longer use."""
+        with self.connection:
+            self.connection.execute("DELETE FROM signs")
+            self.connection.executemany(
+                "INSERT INTO signs (position, arms, hash) VALUES (?, ?, ?)",
+                [(position, arms, block_id) for position, (arms, block_id) in enumerate(signs)]
+            )
+            self.connection.execute("DELETE FROM blocks WHERE hash NOT IN (SELECT hash FROM signs)")
+
+    def close(self):
+        self.connection.close()
+
+# ----------------------------------------------------------------
+# IN-MEMORY COMPILATION
+
+def sign_source(arms, script):
+    """
+    Build the source of one sign from its sheet script, without formatting it.
+
+    The header is on line 0, so the lines and columns of the errors refer to the script cell.
+
+    Args:
+        arms (str): The animation name of the sign.
+        script (str): The script of the sign, with or without its final dot.
+
+    Returns:
+        tuple: (text, lineno) of the sign, as expected by `compile_chunk`.
+    """
+    script = script.strip()
+    if not script.endswith('.'):
+        script += '.'
+    return f"({arms})\n{script}", 0
+
+def compile_signs(signs, parser=None, workers=1):
+    """
+    Compile sheet scripts directly into animations, without writing and reparsing database.txt.
+
+    A script that does not parse as written is compiled again after `auto_indentate`, which
+    drops the characters that are not part of a pose, so the animations are the same as with
+    the text pipeline. The errors of a sign that fails both times are those of its script cell.
+
+    Args:
+        signs (list): (arms, script) of each sign. A script of None is the IDLE animation.
+        parser (str, optional): PLY or RD. Defaults to the compiler PARSER.
+        workers (int, optional): Number of processes. Defaults to 1.
+
+    Returns:
+        list: (animations, report, normalized) of each sign, where animations is the IR of the sign
+              or None if the sign is not valid, and normalized is True if it only compiled after formatting.
+    """
+    chunks = [(IDLE_BLOCK, 1) if script is None else sign_source(arms, script) for arms, script in signs]
+    results = [(animations, chunk_report, False)
+               for animations, chunk_report in compiler.compile_chunks(chunks, workers, parser, ir=True)]
+    retry = [index for index, (animations, _, _) in enumerate(results)
+             if animations is None and signs[index][1] is not None]
+    formatted = compiler.compile_chunks([(format_block(*signs[index]), 1) for index in retry], workers, parser, ir=True)
+    for index, (animations, chunk_report) in zip(retry, formatted):
+        if animations is not None:
+            results[index] = (animations, chunk_report, True)
+    return results
+
+# ----------------------------------------------------------------
+# INCREMENTAL BUILD
+
+def diff_signs(previous, current):
+    """
+    Compare the signs of two builds.
+
+    Args:
+        previous (list): The (arms, hash) pairs of the previous build.
+        current (list): The (arms, hash) pairs of the current build.
+
+    Returns:
+        tuple: The added, changed and removed sign names.
+    """
+    previous_hashes = {}
+    for arms, block_id in previous:
+        previous_hashes.setdefault(arms, []).append(block_id)
+    current_hashes = {}
+    for arms, block_id in current:
+        current_hashes.setdefault(arms, []).append(block_id)
+    added = [arms for arms in current_hashes if arms not in previous_hashes]
+    changed = [arms for arms in current_hashes
+               if arms in previous_hashes and current_hashes[arms] != previous_hashes[arms]]
+    removed = [arms for arms in previous_hashes if arms not in current_hashes]
+    return added, changed, removed
+
+def main_build(data, output_file, text_file=None, cache_file='OUTPUT/build.sqlite3',
+               manifest_file='OUTPUT/manifest.json', parser=None, workers=1, resilient=False, binary_file=None,
+               ir_file=None, pool_file=None, simplify=None, scales=None, timeline_file=None, durations_file=None,
+               spacing=compiler.KEYFRAME_SPACING, fps=compiler.FPS):
+    """
+    Compile the database incrementally: only the signs whose script changed since the last build are compiled.
+
+    The scripts are compiled in memory with `compile_signs`; database.txt is only formatted and
+    written if text_file is given. The output files are identical to those of `main_database`
+    followed by `main_compiler`.
+    The manifest lists the added, changed and removed signs, so the following steps
+    (Blender baking, frontend assets) can update only these signs.
+    If a sign does not compile, the output files and the list of signs of the cache are not updated,
+    unless resilient is True: the invalid signs are then left out of the output and listed in the manifest.
+
+    Args:
+        data (dict): The database returned by `clean_database`.
+        output_file (str): Path to the JSON database file.
+        text_file (str, optional): Path to the formatted database text file, for humans. Not written if None.
+        cache_file (str, optional): Path to the SQLite build cache. Defaults to 'OUTPUT/build.sqlite3'.
+        manifest_file (str, optional): Path to the JSON change manifest. Defaults to 'OUTPUT/manifest.json'.
+        parser (str, optional): PLY or RD. Defaults to the compiler PARSER.
+        workers (int, optional): Number of processes compiling the changed signs. Defaults to 1.
+        resilient (bool, optional): Build the valid signs even if some signs do not compile. Defaults to False.
+        binary_file (str, optional): Path to the binary animation container. Not written if None.
+        ir_file (str, optional): Path to the JSON database in the intermediate representation. Not written if None.
+        pool_file (str, optional): Path to the JSON database with interned poses, see `compiler.intern_animations`.
+                                   Not written if None; its statistics are then not in the manifest.
+        simplify (float, optional): Tolerance of the keyframe simplification of database.json, see
+                                    `compiler.simplify_poses`. Not simplified if None. The binary
+                                    container and the IR keep every keyframe.
+        scales (dict, optional): SCALE_RIGHT and SCALE_LEFT of the plug-in, so the tolerance is in degrees.
+        timeline_file (str, optional): Path to the keyframe times of each sign, see `compiler.timeline`. Not written if None.
+        durations_file (str, optional): Path to the duration index of the signs. Not written if None.
+        spacing (int, optional): The "Pose Duration" of the plug-in, in frames. Defaults to compiler.KEYFRAME_SPACING.
+        fps (int, optional): Frame rate of the baked animations. Defaults to compiler.FPS.
+
+    Returns:
+        dict: The change manifest.
+    """
+    start = time.perf_counter()
+    toolchain = toolchain_hash()
+    cache = BuildCache(cache_file)
+    entries = [('IDLE', None)] + [(value['arms'], value['script']) for value in data.values()]
+
+    # Reuse the cached blocks and compile the others
+    items = []
+    for arms, script in entries:
+        block_id = block_hash(toolchain, arms, script if script is not None else IDLE_BLOCK)
+        items.append({"arms": arms, "script": script, "hash": block_id, "block": cache.get_block(block_id)})
+    pending = [item for item in items if item["block"] is None]
+    results = compile_signs([(item["arms"], item["script"]) for item in pending], parser, workers)
+    errors = []
+    for item, (animations, chunk_report, formatted) in zip(pending, results):
+        if animations is None:
+            errors.extend(dict(error, sign=item["arms"]) for error in chunk_report["errors"])
+            continue
+        item["block"] = {"animations": animations, "poses": chunk_report["poses"], "normalized": formatted}
+    cache.put_blocks([(item["hash"], item["block"]) for item in pending if item["block"] is not None])
+
+    valid = [item for item in items if item["block"] is not None]
+    # The cached signs that only compiled after formatting are listed too
+    normalized = [item["arms"] for item in valid if item["block"]["normalized"]]
+    signs = [(item["arms"], item["hash"]) for item in valid]
+    failed = [(item["arms"], None) for item in items if item["block"] is None]
+    # In resilient mode the invalid signs are removed from the output, not changed
+    added, changed, removed = diff_signs(cache.signs(), signs if resilient else signs + failed)
+    dedup = None
+    simplified = None
+    if resilient or not errors:
+        program = [animation for item in valid for animation in item["block"]["animations"]]
+        animations = compiler.expand_animations(program)
+        output = animations
+        if simplify is not None:
+            output, saved = compiler.simplify_animations(animations, simplify, scales)
+            simplified = {
+                "tolerance": simplify,
+                "keyframes": sum(len(animation["poses"]) for entry in animations for animation in entry.values()),
+                "saved": sum(saved.values()),
+                "signs": saved
+            }
+        with open(output_file, 'w') as file:
+            file.write(compiler.dump_database(output))
+        if timeline_file or durations_file:
+            times, durations = compiler.timeline(output, spacing, fps)
+            for path, content in ((timeline_file, times), (durations_file, durations)):
+                if path:
+                    with open(path, 'w') as file:
+                        file.write(json.dumps(content, indent=4, ensure_ascii=False, cls=compiler.SingleLineListEncoder))
+        if ir_file:
+            with open(ir_file, 'w') as file:
+                file.write(compiler.dump_database(program))
+        if pool_file:
+            pool, dedup = compiler.intern_animations(program)
+            with open(pool_file, 'w') as file:
+                file.write(compiler.dump_database(pool))
+        if binary_file:
+            write_binary(animations, binary_file)
+        if text_file:
+            # Only formatted when the text is requested
+            with open(text_file, 'w') as file:
+                file.write(''.join(IDLE_BLOCK if item["script"] is None else format_block(item["arms"], item["script"])
+                                   for item in valid))
+        cache.save_signs(signs)
+    cache.close()
+
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "output": output_file,
+        "success": not errors,
+        "skipped": [arms for arms, _ in failed],
+        "normalized": normalized,
+        "signs": len(entries),
+        "compiled": len(pending) - len(failed),
+        "reused": len(items) - len(pending),
+        "poses": sum(item["block"]["poses"] for item in valid),
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "dedup": dedup,
+        "simplified": simplified,
+        "errors": errors,
+        "duration": time.perf_counter() - start
+    }
+    directory = os.path.dirname(manifest_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(manifest_file, 'w') as file:
+        json.dump(manifest, file, indent=4, ensure_ascii=False)
+    return manifest
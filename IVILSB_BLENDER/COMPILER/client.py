@@ -1,32 +1,24 @@
-import gspread
-import tkinter as tk
-from tkinter import filedialog
 import json
-from google.oauth2.service_account import Credentials
 from database import clean_database, remove_empty_scripts
+from source import GoogleSheetSource, FileSource, fetch_rows
 
-SPREADSHEET_NAME = 'Categorizacion LSB' 
-SHEET_NAME = 'Glosario v3'
-SERVICE_ACCOUNT_FILE = 'COMPILER/client.json'
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly', 
-          'https://www.googleapis.com/auth/drive.readonly']
-
-def fetch_database():
-    # Authorize and create a client to interact with the Google Sheets API
-    credentials = Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    client = gspread.authorize(credentials)
-
-    # Open the Google Sheet
-    spreadsheet = client.open(SPREADSHEET_NAME)
-    worksheet = spreadsheet.worksheet(SHEET_NAME)
-    return(worksheet.get_all_values())
+def fetch_database(source_file=None, snapshot_file=None, ranged=False):
+    # Read the glossary from a CSV/XLSX export, or from Google Sheets
+    source = FileSource(source_file) if source_file else GoogleSheetSource()
+    rows, status = fetch_rows(source, snapshot_file, ranged)
+    if status['downloaded']:
+        print(f"{source.name} downloaded (revision {status['revision']}): {len(status['added'])} signs added, "
+              f"{len(status['changed'])} changed, {len(status['removed'])} removed")
+    else:
+        print(f"{source.name} unchanged since revision {status['revision']}, snapshot used")
+    return rows
 
 def export_dictionnary_json(dictionnary, json_path):
     with open(json_path, 'w') as f:
         json.dump(dictionnary, f, indent=4)
 
-def export_animations_json(dictionnary):
+def animations_list(dictionnary):
+    # signs listed in the animations.json file of the frontend
     formatted_data = []
     for key, value in dictionnary.items():
         if len(value['script']) > 50:
@@ -36,26 +28,34 @@ def export_animations_json(dictionnary):
                 "face": value["face"]
             }
             formatted_data.append(formatted_item)
-    root = tk.Tk()
-    root.withdraw() 
-    file_path = filedialog.asksaveasfilename(
-        title="Choose where to save the file animations.json",
-        defaultextension=".json", 
-        filetypes=[("JSON files", "*.json")],
-        initialdir="../IVILSB_FRONTEND/public/FBX",
-        initialfile="animations.json"  
-        )
+    return formatted_data
+
+def export_animations_json(dictionnary, file_path=None):
+    formatted_data = animations_list(dictionnary)
+    if file_path is None:
+        # ask for the path when it is not given (interactive runs only)
+        import tkinter as tk
+        from tkinter import filedialog
+        root = tk.Tk()
+        root.withdraw() 
+        file_path = filedialog.asksaveasfilename(
+            title="Choose where to save the file animations.json",
+            defaultextension=".json", 
+            filetypes=[("JSON files", "*.json")],
+            initialdir="../IVILSB_FRONTEND/public/FBX",
+            initialfile="animations.json"  
+            )
     if file_path:
         with open(file_path, 'w') as f:
             json.dump(formatted_data, f, indent=4)
 
 # exported function
-def main_client(DICTIONNARY_JSON):
+def main_client(DICTIONNARY_JSON, source_file=None, snapshot_file=None, ranged=False, animations_json=None):
     print('Fetching data...')
-    data = fetch_database()
+    data = fetch_database(source_file, snapshot_file, ranged)
     data = clean_database(data)
     export_dictionnary_json(data, DICTIONNARY_JSON)
-    export_animations_json(data)
+    export_animations_json(data, animations_json)
     print(len(data), "animations fetched")
     data = remove_empty_scripts(data)
     print(len(data), "animations kept")
@@ -64,7 +64,55 @@ def remove_empty_scripts(dictionnary):
 
 import re
 
+# ----------------------------------------------------------------
+# FORMATTER
+
+INDENT_STEP = "    "
+NUMBER = r'-?\d+(?:\.\d+)?'
+VECTOR = r'\[' + NUMBER + ',' + NUMBER + ',' + NUMBER + r'\]'
+HAND = r'\{[A-Za-z_0-9]+,' + VECTOR + ',' + VECTOR + ',' + VECTOR + r'\}'
+# A block header, a closing parenthesis or a pose, each with its optional trailing comma
+FORMAT_TOKEN = re.compile(
+    r'(?P<block>(?:SPEED|REPEAT)\(\d+,)'
+    r'|(?P<close>\),?)'
+    r'|(?P<pose>' + HAND + '-' + HAND + ',?)'
+)
+
 def auto_indentate(script):
+    """
+    Format a script with one pose or block per line, indented by block level.
+
+    The characters that are not part of a block header, a closing parenthesis or a pose are
+    dropped. The script is scanned once, from one token to the next, so the formatting time
+    is linear in the length of the script. The output is identical to `auto_indentate_legacy`.
+
+    Args:
+        script (str): The script of a sign.
+
+    Returns:
+        str: The formatted script, ending with a dot.
+    """
+    script = re.sub(r'\s+', '', script)
+    indent_level = 0
+    formatted_lines = []
+    search = FORMAT_TOKEN.search
+    match = search(script)
+    while match:
+        kind = match.lastgroup
+        if kind == 'close':
+            indent_level -= 1
+        formatted_lines.append(INDENT_STEP * indent_level + match.group())
+        if kind == 'block':
+            indent_level += 1
+        match = search(script, match.end())
+
+    formatted_script = '\n'.join(formatted_lines).strip()
+    if not formatted_script.endswith('.'):
+        formatted_script += '.'
+    return formatted_script
+
+def auto_indentate_legacy(script):
+    # Original formatter, kept to check and benchmark auto_indentate
     # Remove all spaces, line breaks, and tabulations
     script = re.sub(r'\s+', '', script)
     
@@ -84,6 +132,8 @@ def auto_indentate(script):
                 formatted_lines.append(indent_step * indent_level + match.group(0))
                 indent_level += 1
                 index += len(match.group(0))
+            else:
+                index += 1
         elif script[index] == ')':
             indent_level -= 1
             formatted_lines.append(indent_step * indent_level + ')')
@@ -114,18 +164,25 @@ def auto_indentate(script):
     return formatted_script
 
 
+# Idle animation, always the first block of the database
+IDLE_BLOCK = (
+    "(IDLE)\n\n"
+    "SPEED(2,\n"
+    "    {R_P3, [0.28, -0.11, 0.94], [0.00, 0.27, 0.00], [0.22, 0.33, 0.00]} - "
+    "{L_P3, [0.28, -0.11, 0.94], [0.00, 0.27, 0.00], [0.22, 0.33, 0.00]},\n"
+    "    {R_P3, [0.29, -0.10, 0.95], [0.01, 0.28, 0.01], [0.23, 0.34, 0.01]} - "
+    "{L_P3, [0.29, -0.10, 0.95], [0.01, 0.28, 0.01], [0.23, 0.34, 0.01]}\n"
+    ").\n\n"
+)
+
+def format_block(arms, script):
+    formatted_script = auto_indentate(script)
+    # formatted_script = script
+    return f"({arms})\n\n{formatted_script}\n\n"
+
 def main_database(data, output_file):
     with open(output_file, "w") as file:
-        file.write("(IDLE)\n\n")
-        file.write("SPEED(2,\n")
-        file.write("    {R_P3, [0.28, -0.11, 0.94], [0.00, 0.27, 0.00], [0.22, 0.33, 0.00]} - ")
-        file.write("{L_P3, [0.28, -0.11, 0.94], [0.00, 0.27, 0.00], [0.22, 0.33, 0.00]},\n")
-        file.write("    {R_P3, [0.29, -0.10, 0.95], [0.01, 0.28, 0.01], [0.23, 0.34, 0.01]} - ")
-        file.write("{L_P3, [0.29, -0.10, 0.95], [0.01, 0.28, 0.01], [0.23, 0.34, 0.01]}\n")
-        file.write(").\n\n")
+        file.write(IDLE_BLOCK)
         for key, value in data.items():
-            file.write(f"({value['arms']})\n\n")
-            formatted_script = auto_indentate(value['script'])
-            # formatted_script = value['script']
-            file.write(f"{formatted_script}\n\n")
+            file.write(format_block(value['arms'], value['script']))
     print("Database file created successfully")
\ No newline at end of file
@@ -1,24 +1,91 @@
-from client import main_client
-from database import main_database
-from compiler import main_compiler
+import argparse
+import os
+
+from pipeline import compiler_pipeline, print_timings
 
 DATABASE_TXT = 'OUTPUT/database.txt'
 DATABASE_JSON = 'OUTPUT/database.json'
+DATABASE_BIN = 'OUTPUT/database.bin'         # binary container, see binary.py
+DATABASE_IR = 'OUTPUT/database.ir.json'      # REPEAT and SPEED blocks unexpanded, see compiler.expand
+DATABASE_POOL = 'OUTPUT/database.pool.json'  # unique poses, see compiler.intern_animations
 DICTIONNARY_JSON = 'OUTPUT/dictionnary.json'
+ANIMATIONS_JSON = '../IVILSB_FRONTEND/public/FBX/animations.json'  # signs listed by the frontend
+BUILD_CACHE = 'OUTPUT/build.sqlite3'         # delete it to force a full rebuild
+MANIFEST_JSON = 'OUTPUT/manifest.json'
+PIPELINE_STATE = 'OUTPUT/pipeline.json'      # hashes of the last run of each stage
+VALIDATION_JSON = 'OUTPUT/validation.json'   # problems found before baking, see validate.py
+DATABASE_VALID = 'OUTPUT/database.valid.json'  # database.json without the invalid signs, to bake in Blender
+TIMELINE_JSON = 'OUTPUT/timeline.json'       # frames and times of the keyframes of each sign
+DURATIONS_JSON = 'OUTPUT/durations.json'     # duration of each sign, for the backend and frontend
+HAND_POSES_DIR = 'BLENDER/hand_poses'
+CONSTANTS_JSON = 'BLENDER/constants.json'
+SHEET_SNAPSHOT = 'OUTPUT/sheet.snapshot.json'  # the sheet is only downloaded if it changed since this snapshot
+SOURCE_FILE = None  # CSV/XLSX export of the sheet, read instead of Google Sheets (offline builds)
+RANGED_FETCH = True # only download the Words, Face and Script columns
+BUILD_WORKERS = os.cpu_count() or 1
+TEXT_OUTPUT = False # also write the formatted database.txt, for humans
+RESILIENT = True    # skip the signs that do not compile instead of failing the build
+SIMPLIFY = None     # tolerance in degrees of the keyframe simplification, None to keep every keyframe
+KEYFRAME_SPACING = 10 # "Pose Duration" of the plug-in, in frames
+FPS = 24            # frame rate of the baked animations
 
 if __name__ == '__main__':
-    # fetch and clean data from Google Sheets
-    print("\n---------------------------------------------")
-    print("Fetching data from Google Sheets")
-    print("---------------------------------------------")
-    data = main_client(DICTIONNARY_JSON)
-    # create database txt file from data
+    arg_parser = argparse.ArgumentParser(description="Fetch the glossary and compile the animation database, without interaction.")
+    arg_parser.add_argument('--source', default=SOURCE_FILE, help="CSV/XLSX export of the sheet, instead of Google Sheets")
+    arg_parser.add_argument('--snapshot', default=SHEET_SNAPSHOT, help="Local snapshot of the sheet")
+    arg_parser.add_argument('--full-fetch', action='store_true', help="Download every column of the sheet")
+    arg_parser.add_argument('--dictionnary', default=DICTIONNARY_JSON, help="Output dictionnary of all the signs")
+    arg_parser.add_argument('--animations', default=ANIMATIONS_JSON, help="Output animations.json of the frontend ('' to skip)")
+    arg_parser.add_argument('--database', default=DATABASE_JSON, help="Output JSON database")
+    arg_parser.add_argument('--binary', default=DATABASE_BIN, help="Output binary container ('' to skip)")
+    arg_parser.add_argument('--ir', default=DATABASE_IR, help="Output IR database ('' to skip)")
+    arg_parser.add_argument('--pool', default=DATABASE_POOL, help="Output database of interned poses ('' to skip)")
+    arg_parser.add_argument('--text', default=DATABASE_TXT if TEXT_OUTPUT else '', help="Output formatted database.txt ('' to skip)")
+    arg_parser.add_argument('--timeline', default=TIMELINE_JSON, help="Output keyframe times of each sign ('' to skip)")
+    arg_parser.add_argument('--durations', default=DURATIONS_JSON, help="Output duration index ('' to skip)")
+    arg_parser.add_argument('--spacing', type=int, default=KEYFRAME_SPACING, help="Pose Duration of the plug-in, in frames")
+    arg_parser.add_argument('--fps', type=int, default=FPS, help="Frame rate of the baked animations")
+    arg_parser.add_argument('--cache', default=BUILD_CACHE, help="Build cache")
+    arg_parser.add_argument('--manifest', default=MANIFEST_JSON, help="Output change manifest")
+    arg_parser.add_argument('--state', default=PIPELINE_STATE, help="State of the pipeline")
+    arg_parser.add_argument('--validation', default=VALIDATION_JSON, help="Output validation report ('' to skip the validation)")
+    arg_parser.add_argument('--valid-database', default=DATABASE_VALID, help="Output database without the invalid signs ('' to skip)")
+    arg_parser.add_argument('--hand-poses', default=HAND_POSES_DIR, help="Directory of the .blend hand poses")
+    arg_parser.add_argument('--constants', default=CONSTANTS_JSON, help="constants.json of the plug-in")
+    arg_parser.add_argument('--workers', type=int, default=BUILD_WORKERS, help="Number of processes compiling the signs")
+    arg_parser.add_argument('--strict', action='store_true', default=not RESILIENT, help="Fail the build if a sign does not compile")
+    arg_parser.add_argument('--simplify', type=float, default=SIMPLIFY, metavar='DEGREES',
+                            help="Drop the keyframes reproduced by the interpolation within this tolerance")
+    arg_parser.add_argument('--force', action='store_true', help="Run every stage, even if it is up to date")
+    args = arg_parser.parse_args()
+
     print("\n---------------------------------------------")
-    print("Creating database.txt file")
+    print("Building the animation database")
     print("---------------------------------------------")
-    main_database(data, DATABASE_TXT)
-    # compile database.txt file into database.json file
+    pipeline = compiler_pipeline(args.dictionnary, args.animations or None, args.database, args.text or None,
+                                 args.binary or None, args.ir or None, args.pool or None, args.cache, args.manifest,
+                                 args.state, args.source, args.snapshot, not args.full_fetch, args.workers, not args.strict,
+                                 args.validation or None, args.valid_database or None, args.hand_poses, args.constants,
+                                 args.simplify, args.timeline or None, args.durations or None, args.spacing, args.fps)
+    results, timings = pipeline.run(args.force)
+    manifest = results["build"]
+    if manifest is None:
+        print("database.json is up to date")
+    else:
+        for error in manifest['errors']:
+            print(f"{error['sign']}: {error['message']}")
+        print(f"{manifest['compiled']} signs compiled, {manifest['reused']} reused in {manifest['duration']:.2f}s")
+        print(f"{len(manifest['added'])} added, {len(manifest['changed'])} changed, {len(manifest['removed'])} removed")
+        if manifest['dedup']:
+            print(f"{manifest['dedup']['keyframes']} keyframes, {manifest['dedup']['poses']} unique poses (x{manifest['dedup']['ratio']:.2f})")
+        if manifest['simplified']:
+            print(f"{manifest['simplified']['saved']} of {manifest['simplified']['keyframes']} keyframes saved by the simplification")
+        if manifest['skipped']:
+            print(f"{len(manifest['skipped'])} signs skipped: {', '.join(manifest['skipped'])}")
+        elif not manifest['success']:
+            print("Build failed, database.json was not updated")
+    validation = results.get("validate")
+    if validation is not None:
+        print(f"{len(validation['invalid'])} of {validation['signs']} signs invalid, see {args.validation}")
     print("\n---------------------------------------------")
-    print("Creating database.json file")
-    print("---------------------------------------------")
-    main_compiler(DATABASE_TXT, DATABASE_JSON)
\ No newline at end of file
+    print_timings(timings)
@@ -0,0 +1,204 @@
+# pipeline.py
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from build import main_build, toolchain_hash
+from compiler import KEYFRAME_SPACING, FPS
+from client import fetch_database, export_dictionnary_json, export_animations_json
+from database import clean_database, remove_empty_scripts
+from validate import main_validate, hand_pose_names, load_scales, HAND_POSES_DIR, CONSTANTS_JSON
+
+# ----------------------------------------------------------------
+# STAGE GRAPH
+
+def content_hash(*values):
+    """Hash JSON-serializable values."""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def file_hash(path):
+    """Hash the content of a file, or return None if it does not exist."""
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    A stage with output files is skipped when the hash of its inputs (the results of the stages it
+    requires, and its key) and the hashes of its output files are those of its last run.
+    A stage without output files always runs.
+    """
+
+    def __init__(self, name, function, requires=(), outputs=(), key=None, check=None):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.outputs = tuple(path for path in outputs if path)
+        self.key = key
+        self.check = check
+
+class Pipeline:
+    """
+    Run stages in the order of their dependencies; the stages whose dependencies are done run concurrently.
+
+    The hashes of the last run of each stage are kept in a JSON state file.
+    """
+
+    def __init__(self, state_file='OUTPUT/pipeline.json', workers=4):
+        self.state_file = state_file
+        self.workers = workers
+        self.stages = []
+
+    def add(self, name, function, requires=(), outputs=(), key=None, check=None):
+        """
+        Add a stage, called with the results of the stages it requires.
+
+        Args:
+            name (str): Name of the stage.
+            function (callable): Function of the stage.
+            requires (tuple, optional): Names of the stages whose results are the arguments of the function.
+            outputs (tuple, optional): Paths of the files written by the stage. The None paths are ignored.
+            key (optional): JSON-serializable options of the stage; a change of the key reruns the stage.
+            check (callable, optional): Called with the result of the function; if it returns False,
+                                        the stage failed and will run again next time.
+        """
+        self.stages.append(Stage(name, function, requires, outputs, key, check))
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state):
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.state_file + '.tmp', 'w') as file:
+            json.dump(state, file, indent=4)
+        os.replace(self.state_file + '.tmp', self.state_file)
+
+    def run_stage(self, stage, previous, arguments, force):
+        start = time.perf_counter()
+        inputs = content_hash(stage.key, arguments) if stage.outputs else None
+        if (not force and stage.outputs and previous is not None and previous["inputs"] == inputs
+                and previous["outputs"] == {path: file_hash(path) for path in stage.outputs}):
+            return None, "skipped", time.perf_counter() - start, previous
+        for path in stage.outputs:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        result = stage.function(*arguments)
+        if stage.check is not None and not stage.check(result):
+            return result, "failed", time.perf_counter() - start, None
+        state = {"inputs": inputs, "outputs": {path: file_hash(path) for path in stage.outputs}} if stage.outputs else None
+        return result, "done", time.perf_counter() - start, state
+
+    def run(self, force=False):
+        """
+        Run the stages.
+
+        Args:
+            force (bool, optional): Run every stage, even if it is up to date. Defaults to False.
+
+        Returns:
+            tuple: The results of the stages (None for the skipped stages), and their
+                   timings {name: {"status", "duration"}} in the order they finished.
+        """
+        state = self.load_state()
+        results = {}
+        timings = {}
+        pending = list(self.stages)
+        with ThreadPoolExecutor(self.workers) as executor:
+            while pending:
+                ready = [stage for stage in pending if all(name in results for name in stage.requires)]
+                if not ready:
+                    raise ValueError(f"Unknown or circular dependencies: {', '.join(stage.name for stage in pending)}")
+                futures = [(stage, executor.submit(self.run_stage, stage, state.get(stage.name),
+                                                   [results[name] for name in stage.requires], force))
+                           for stage in ready]
+                for stage, future in futures:
+                    results[stage.name], status, duration, stage_state = future.result()
+                    timings[stage.name] = {"status": status, "duration": duration}
+                    if status == "failed":
+                        state.pop(stage.name, None)
+                    elif stage_state is not None:
+                        state[stage.name] = stage_state
+                pending = [stage for stage in pending if stage not in ready]
+        self.save_state(state)
+        return results, timings
+
+def print_timings(timings):
+    """Print the status and duration of each stage."""
+    for name, timing in timings.items():
+        print(f"{name:<12} {timing['status']:<8} {timing['duration']:8.3f}s")
+    print(f"{'total':<12} {'':<8} {sum(timing['duration'] for timing in timings.values()):8.3f}s")
+
+# ----------------------------------------------------------------
+# COMPILER PIPELINE
+
+def compiler_pipeline(dictionnary_json, animations_json, database_json, text_file=None, binary_file=None,
+                      ir_file=None, pool_file=None, cache_file='OUTPUT/build.sqlite3',
+                      manifest_file='OUTPUT/manifest.json', state_file='OUTPUT/pipeline.json',
+                      source_file=None, snapshot_file=None, ranged=False, workers=1, resilient=False,
+                      validation_file=None, valid_file=None, hand_poses_dir=HAND_POSES_DIR, constants_file=CONSTANTS_JSON,
+                      simplify=None, timeline_file=None, durations_file=None, spacing=KEYFRAME_SPACING, fps=FPS):
+    """
+    Create the pipeline of the compiler: fetch and clean the table, then write the dictionnary,
+    the animations.json file of the frontend and the database concurrently, then validate the
+    database. Nothing is interactive.
+
+    Args:
+        dictionnary_json (str): Path to the dictionnary of all the signs.
+        animations_json (str): Path to the animations.json file of the frontend. Not written if None.
+        database_json (str): Path to the JSON database.
+        text_file, binary_file, ir_file, pool_file, cache_file, manifest_file: See `main_build`.
+        state_file (str, optional): Path to the state of the pipeline. Defaults to 'OUTPUT/pipeline.json'.
+        source_file, snapshot_file, ranged: See `fetch_database`.
+        workers (int, optional): Number of processes compiling the signs. Defaults to 1.
+        resilient (bool, optional): See `main_build`. Defaults to False.
+        validation_file (str, optional): Path to the validation report. The database is not validated if None.
+        valid_file, hand_poses_dir, constants_file: See `main_validate`.
+        simplify (float, optional): Tolerance in degrees of the keyframe simplification. Not simplified if None.
+        timeline_file, durations_file, spacing, fps: See `main_build`.
+
+    Returns:
+        Pipeline: The pipeline; the results of its "build" and "validate" stages are the build manifest
+                  and the validation report.
+    """
+    pipeline = Pipeline(state_file)
+    pipeline.add("fetch", lambda: fetch_database(source_file, snapshot_file, ranged))
+    pipeline.add("clean", clean_database, requires=("fetch",))
+    pipeline.add("dictionnary", lambda data: export_dictionnary_json(data, dictionnary_json),
+                 requires=("clean",), outputs=(dictionnary_json,))
+    if animations_json:
+        pipeline.add("animations", lambda data: export_animations_json(data, animations_json),
+                     requires=("clean",), outputs=(animations_json,))
+    build_outputs = (database_json, text_file, binary_file, ir_file, pool_file, timeline_file, durations_file)
+    scales = load_scales(constants_file) if simplify is not None else None
+    pipeline.add("build", lambda data: main_build(remove_empty_scripts(data), database_json, text_file, cache_file,
+                                                  manifest_file, workers=workers, resilient=resilient,
+                                                  binary_file=binary_file, ir_file=ir_file, pool_file=pool_file,
+                                                  simplify=simplify, scales=scales, timeline_file=timeline_file,
+                                                  durations_file=durations_file, spacing=spacing, fps=fps),
+                 requires=("clean",), outputs=build_outputs,
+                 key=[toolchain_hash(), resilient, build_outputs, simplify, scales, spacing, fps],
+                 check=lambda manifest: manifest['success'] or resilient)
+    if validation_file:
+        hand_poses = sorted(hand_pose_names(hand_poses_dir)) if hand_poses_dir and os.path.isdir(hand_poses_dir) else None
+        pipeline.add("validate", lambda data, manifest: main_validate(ir_file or database_json, validation_file, valid_file,
+                                                                      hand_poses_dir, constants_file, data, simplify),
+                     requires=("clean", "build"), outputs=(validation_file, valid_file),
+                     key=[toolchain_hash(), hand_poses, file_hash(constants_file) if constants_file else None, simplify])
+    return pipeline
@@ -0,0 +1,196 @@
+# source.py
+import csv
+import json
+import os
+
+SPREADSHEET_NAME = 'Categorizacion LSB'
+SHEET_NAME = 'Glosario v3'
+SERVICE_ACCOUNT_FILE = 'COMPILER/client.json'
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly',
+          'https://www.googleapis.com/auth/drive.readonly']
+
+# Columns read by `clean_database`, the only ones fetched in ranged mode
+COLUMNS = ('Words', 'Face', 'Script')
+
+# ----------------------------------------------------------------
+# SOURCES
+# A source returns the rows of the glossary as `get_all_values` does: the header, then
+# one list of strings per row, all of the same length. `revision` identifies the content
+# of the source without reading it.
+
+class GoogleSheetSource:
+    """The glossary worksheet on Google Sheets."""
+
+    def __init__(self, spreadsheet_name=SPREADSHEET_NAME, sheet_name=SHEET_NAME,
+                 service_account_file=SERVICE_ACCOUNT_FILE):
+        # Only needed with this source, so the offline builds do not need the Google libraries
+        import gspread
+        from google.oauth2.service_account import Credentials
+        credentials = Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
+        client = gspread.authorize(credentials)
+        self.spreadsheet = client.open(spreadsheet_name)
+        self.worksheet = self.spreadsheet.worksheet(sheet_name)
+        self.name = f"{spreadsheet_name}/{sheet_name}"
+
+    def revision(self):
+        """Return the modification time of the spreadsheet, from the Drive API."""
+        return self.spreadsheet.lastUpdateTime
+
+    def values(self, columns=None):
+        """
+        Download the rows of the worksheet.
+
+        Args:
+            columns (tuple, optional): Header names of the columns to download. All the columns if None.
+
+        Returns:
+            list: The header and the rows.
+        """
+        if columns is None:
+            return pad_rows(self.worksheet.get_all_values())
+        from gspread.utils import rowcol_to_a1
+        ranges = []
+        for index in column_indexes(self.worksheet.row_values(1), columns, self.name):
+            letter = rowcol_to_a1(1, index + 1)[:-1]
+            ranges.append(f"{letter}:{letter}")
+        cells = [[row[0] if row else '' for row in values] for values in self.worksheet.batch_get(ranges)]
+        count = max(len(values) for values in cells)
+        return pad_rows([[values[i] if i < len(values) else '' for values in cells] for i in range(count)])
+
+class FileSource:
+    """
+    A CSV or XLSX export of the glossary, to build without network access.
+
+    The XLSX files are read with openpyxl, from the sheet named sheet_name if it exists, else the first sheet.
+    """
+
+    def __init__(self, path, sheet_name=SHEET_NAME):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.name = path
+
+    def revision(self):
+        """Return the modification time and the size of the file."""
+        stat = os.stat(self.path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def values(self, columns=None):
+        """
+        Read the rows of the file.
+
+        Args:
+            columns (tuple, optional): Header names of the columns to keep. All the columns if None.
+
+        Returns:
+            list: The header and the rows.
+        """
+        if self.path.lower().endswith('.xlsx'):
+            try:
+                import openpyxl
+            except ImportError:
+                raise ImportError("openpyxl is required to read XLSX files (pip install openpyxl)")
+            workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+            sheet = workbook[self.sheet_name] if self.sheet_name in workbook.sheetnames else workbook.worksheets[0]
+            rows = [['' if value is None else str(value) for value in row] for row in sheet.iter_rows(values_only=True)]
+            workbook.close()
+        else:
+            with open(self.path, 'r', encoding='utf-8-sig', newline='') as file:
+                rows = list(csv.reader(file))
+        rows = pad_rows(rows)
+        if columns is None or not rows:
+            return rows
+        indexes = column_indexes(rows[0], columns, self.name)
+        return [[row[i] for i in indexes] for row in rows]
+
+def column_indexes(header, columns, name):
+    """
+    Return the index of each column in the header row.
+
+    Raises:
+        ValueError: If a column is not in the header, e.g. a renamed header in the sheet.
+    """
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"Missing column(s) {', '.join(missing)} in the header of {name} "
+                         f"(found: {', '.join(value for value in header if value) or 'none'})")
+    return [header.index(column) for column in columns]
+
+def pad_rows(rows):
+    """Pad the rows with empty strings to the length of the longest row, as `get_all_values` does."""
+    width = max((len(row) for row in rows), default=0)
+    return [list(row) + [''] * (width - len(row)) for row in rows]
+
+# ----------------------------------------------------------------
+# SNAPSHOT
+
+def load_snapshot(path):
+    """Return the snapshot saved by `save_snapshot`, or None if there is none."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_snapshot(path, snapshot):
+    """Write the snapshot atomically, so an interrupted build does not leave a truncated file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(snapshot, file, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+def diff_rows(previous, current, key='Words'):
+    """
+    Compare the rows (header included) of two tables by their key column, so that inserting or
+    deleting a row does not change the others.
+
+    Returns:
+        tuple: The keys of the added, changed and removed rows.
+    """
+    def keyed(rows):
+        if not rows or key not in rows[0]:
+            return {}
+        index = rows[0].index(key)
+        # Rows with the same key are compared together
+        table = {}
+        for row in rows[1:]:
+            table.setdefault(row[index], []).append(row)
+        return table
+
+    before = keyed(previous)
+    after = keyed(current)
+    added = [name for name in after if name not in before]
+    changed = [name for name in after if name in before and before[name] != after[name]]
+    removed = [name for name in before if name not in after]
+    return added, changed, removed
+
+def fetch_rows(source, snapshot_file=None, ranged=False):
+    """
+    Return the rows of the source, downloading them only if the source changed since the snapshot.
+
+    Args:
+        source (GoogleSheetSource or FileSource): The source of the glossary.
+        snapshot_file (str, optional): Path to the local snapshot. No snapshot is used if None.
+        ranged (bool, optional): Only fetch the COLUMNS used by the build. Defaults to False.
+
+    Returns:
+        tuple: The rows, and the status {"source", "revision", "downloaded", "rows", "added", "changed", "removed"},
+               where added, changed and removed list the Words of the rows that differ from the snapshot.
+    """
+    columns = list(COLUMNS) if ranged else None
+    revision = source.revision()
+    snapshot = load_snapshot(snapshot_file) if snapshot_file else None
+    if (snapshot is not None and snapshot.get("source") == source.name
+            and snapshot.get("revision") == revision and snapshot.get("columns") == columns):
+        rows = snapshot["rows"]
+        return rows, {"source": source.name, "revision": revision, "downloaded": False, "rows": len(rows) - 1,
+                      "added": [], "changed": [], "removed": []}
+
+    rows = source.values(columns)
+    previous = snapshot["rows"] if snapshot is not None and snapshot.get("columns") == columns else []
+    if snapshot_file:
+        save_snapshot(snapshot_file, {"source": source.name, "revision": revision, "columns": columns, "rows": rows})
+    added, changed, removed = diff_rows(previous, rows)
+    return rows, {"source": source.name, "revision": revision, "downloaded": True, "rows": len(rows) - 1,
+                  "added": added, "changed": changed, "removed": removed}
@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import baker
+
+# REFERENCE (three poses, the second with a SPEED modifier) baked by the plug-in in Blender 4.2 with the
+# default preferences, a Pose Duration of 10 frames and 24 fps: hand_poses.json and tracks.blender.json
+# are the outputs of the "Export Hand Poses" and "Export Baked Tracks" buttons.
+TESTS = os.path.dirname(os.path.abspath(__file__))
+DATA = os.path.join(TESTS, 'data')
+CONSTANTS = os.path.join(os.path.dirname(os.path.dirname(TESTS)), 'BLENDER', 'constants.json')
+
+def load(name):
+    with open(os.path.join(DATA, name), 'r') as file:
+        return json.load(file)
+
+def test_bake_matches_blender():
+    layout, tracks, report = baker.bake_animations(load('reference.json'), baker.load_constants(CONSTANTS),
+                                                   load('hand_poses.json'))
+    assert report["baked"] == 1 and not report["skipped"]
+    parity = baker.compare_tracks(layout, tracks, load('tracks.blender.json'))
+    assert parity["signs"] == 1 and not parity["missing"]
+    assert not parity["failed"]
+    assert parity["error"] <= baker.TOLERANCE
+
+def test_smooth_handles_are_continuous():
+    # Free keyframes between flat ends: the second derivative is continuous on the inner keyframes
+    x = np.array([1.0, 6.0, 11.0, 21.0, 26.0])
+    y = np.array([[0.0], [0.2], [0.5], [0.9], [1.0]], dtype=np.float32)
+    first = np.array([True, False, False, False, False])
+    last = np.array([False, False, False, False, True])
+    left_x, left, right_x, right = baker.bezier_handles(x, y, first, last)
+    assert np.allclose(right_x[:-1] - x[:-1], np.diff(x) / 3) and np.allclose(x[1:] - left_x[1:], np.diff(x) / 3)
+    for i in range(1, 4):
+        before = (y[i] - 2 * left[i] + right[i - 1]) / (x[i] - x[i - 1]) ** 2
+        after = (y[i] - 2 * right[i] + left[i + 1]) / (x[i + 1] - x[i]) ** 2
+        assert np.allclose(before, after, atol=1e-5)
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import binary
+
+def pose(right, speed=1, offset=0.0):
+    result = {'RH': right, 'LH': 'L_P1'}
+    for i, key in enumerate(binary.VECTORS):
+        result[key] = [0.1 * i + offset, -0.25, 0.3]
+    result['speed'] = speed
+    return result
+
+# Two signs named HOLA: the lookup by name returns the first one
+ANIMATIONS = [
+    {"HOLA": {"name": "HOLA", "poses": [pose('R_P1'), pose('R_P2', 0.3)]}},
+    {"ADIOS": {"name": "ADIOS", "poses": [pose('R_P3', 2, 0.5)]}},
+    {"HOLA": {"name": "HOLA", "poses": [pose('R_P4', 1.5)]}},
+    {"ÑANDU": {"name": "ÑANDU", "poses": [pose('R_P1', 0.7), pose('R_P1'), pose('R_P2')]}}
+]
+
+@pytest.fixture
+def database(tmp_path):
+    json_file = tmp_path / 'database.json'
+    json_file.write_text(json.dumps(ANIMATIONS), encoding='utf-8')
+    binary_file = tmp_path / 'database.bin'
+    size = binary.write_binary(ANIMATIONS, str(binary_file))
+    assert size == binary_file.stat().st_size
+    return str(json_file), str(binary_file)
+
+def test_round_trip(database):
+    json_file, binary_file = database
+    assert binary.verify_binary(json_file, binary_file) == []
+    with binary.AnimationPack(binary_file) as pack:
+        assert len(pack) == 4
+        assert pack.names() == ['HOLA', 'ADIOS', 'HOLA', 'ÑANDU']
+        animations = pack.animations()
+    assert [next(iter(entry)) for entry in animations] == ['HOLA', 'ADIOS', 'HOLA', 'ÑANDU']
+    assert binary.compare_animations(ANIMATIONS, animations) == []
+    # float32 speeds come back rounded, integer speeds as int
+    assert animations[0]['HOLA']['poses'][1]['speed'] == pytest.approx(0.3)
+    assert animations[1]['ADIOS']['poses'][0]['speed'] == 2
+
+def test_get(database):
+    _, binary_file = database
+    with binary.AnimationPack(binary_file) as pack:
+        hola = pack.get('HOLA')
+        assert [item['RH'] for item in hola['poses']] == ['R_P1', 'R_P2']
+        assert pack.get('ÑANDU')['poses'][0]['LH'] == 'L_P1'
+        assert pack.get('ADIOS')['poses'][0]['R1'] == pytest.approx([0.5, -0.25, 0.3])
+        assert pack.get('CHAU') is None
+        assert pack.get('') is None
+
+def test_compare_reports_a_different_speed():
+    other = json.loads(json.dumps(ANIMATIONS))
+    other[0]['HOLA']['poses'][1]['speed'] = 0.31
+    assert binary.compare_animations(ANIMATIONS, other) == ["HOLA pose 1: speed 0.3 != 0.31"]
+
+def test_truncated_file(database):
+    _, binary_file = database
+    with open(binary_file, 'rb') as file:
+        data = file.read()
+    with open(binary_file, 'wb') as file:
+        file.write(data[:-8])
+    with pytest.raises(ValueError, match="Truncated animation container"):
+        binary.AnimationPack(binary_file)
+
+def test_wrong_magic(database):
+    _, binary_file = database
+    with open(binary_file, 'r+b') as file:
+        file.write(b'JSON')
+    with pytest.raises(ValueError, match="is not an animation container"):
+        binary.AnimationPack(binary_file)
@@ -0,0 +1,231 @@
+# validate.py
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import compiler
+from database import format_name
+
+HAND_POSES_DIR = 'BLENDER/hand_poses'
+CONSTANTS_JSON = 'BLENDER/constants.json'
+
+# The plug-in multiplies a vector by SCALE_RIGHT/SCALE_LEFT to get degrees, a component is valid in [-LIMIT, LIMIT]
+LIMIT = 1.0
+SCALES = {'R': 'SCALE_RIGHT', 'L': 'SCALE_LEFT'}
+
+# ----------------------------------------------------------------
+# INPUTS
+
+def load_animations(path):
+    """
+    Read animations from database.json, database.ir.json or database.pool.json.
+
+    Returns:
+        list: One {name: animation} dictionary per animation, with its IR body
+              (the keyframes of database.json are a body without REPEAT or SPEED nodes).
+    """
+    with open(path, 'r') as file:
+        return ir_animations(json.load(file))
+
+def ir_animations(data):
+    """Return the animations of a loaded database, with their IR body (see `load_animations`)."""
+    if isinstance(data, dict):
+        return compiler.resolve_pool(data)
+    return [{name: {"name": animation["name"], "body": animation["body"] if "body" in animation else animation["poses"]}
+             for name, animation in entry.items()} for entry in data]
+
+def is_expanded(data):
+    """Return True if a loaded database is database.json, whose poses have their own speed."""
+    return isinstance(data, list) and not any("body" in animation for entry in data for animation in entry.values())
+
+def hand_pose_names(directory):
+    """Return the hand poses that have a .blend file in the directory."""
+    return {name[:-len('.blend')] for name in os.listdir(directory) if name.endswith('.blend')}
+
+def load_scales(path):
+    """Return the SCALE_RIGHT and SCALE_LEFT constants of the plug-in, by side ('R' or 'L')."""
+    with open(path, 'r') as file:
+        constants = json.load(file)
+    return {side: constants[key] for side, key in SCALES.items()}
+
+# ----------------------------------------------------------------
+# CHECKS
+
+def check_vector(key, vector, scales=None):
+    """Return the problem of a vector of the bone `key` (R1 to L3), or None if it is valid."""
+    if not isinstance(vector, list) or len(vector) != 3 or not all(isinstance(x, (int, float)) for x in vector):
+        return f"{key} {vector} is not a vector of 3 numbers"
+    if all(-LIMIT <= x <= LIMIT for x in vector):
+        return None
+    message = f"{key} {vector} is outside [-{LIMIT:g}, {LIMIT:g}]"
+    if scales is not None:
+        scale = scales[key[0]][int(key[1]) - 1]
+        message += f" ({[round(x * s, 2) for x, s in zip(vector, scale)]} degrees, {SCALES[key[0]]} {scale})"
+    return message
+
+def collisions(data):
+    """
+    Find the signs whose names are different but give the same animation name after `format_name`.
+
+    Args:
+        data (dict): The database returned by `clean_database`.
+
+    Returns:
+        dict: The colliding names of each animation name.
+    """
+    names = {}
+    for value in data.values():
+        names.setdefault(format_name(value['name']), set()).add(value['name'])
+    return {arms: sorted(group) for arms, group in names.items() if len(group) > 1}
+
+def validate_animations(animations, hand_poses=None, scales=None, data=None):
+    """
+    Check the animations before they are baked in Blender.
+
+    The hand poses and vectors are interned with `compiler.intern_animations`, so each unique hand
+    pose, vector and pose is checked once for the whole database; the problems are then reported
+    for every sign that uses them.
+
+    Args:
+        animations (list): The animations, as returned by `load_animations` or `parse_animations(..., ir=True)`.
+        hand_poses (set, optional): The hand poses that have a .blend file. Not checked if None.
+        scales (dict, optional): The scales returned by `load_scales`, to give the rotations in degrees.
+        data (dict, optional): The database returned by `clean_database`, to check the name collisions.
+
+    Returns:
+        dict: The report {"signs", "invalid", "problems", "checked", "duration"}, where invalid lists
+              the names of the invalid signs and problems gives {"sign", "check", "message"} for each problem.
+    """
+    start = time.perf_counter()
+    pool, stats = compiler.intern_animations(animations)
+
+    # Each unique value once
+    hand_problems = {}
+    if hand_poses is not None:
+        hand_problems = {index: f"no {hand}.blend hand pose" for index, hand in enumerate(pool["hands"])
+                         if hand not in hand_poses}
+    vector_problems = {}
+    pose_problems = {}
+    for index, pose in enumerate(pool["poses"]):
+        messages = []
+        for key, value in zip(compiler.POSE_KEYS, pose):
+            if key in compiler.HANDS:
+                if value in hand_problems:
+                    messages.append(("hand", f"{key}: {hand_problems[value]}"))
+            else:
+                if (key, value) not in vector_problems:
+                    vector_problems[key, value] = check_vector(key, pool["vectors"][value], scales)
+                if vector_problems[key, value]:
+                    messages.append(("range", vector_problems[key, value]))
+        if messages:
+            pose_problems[index] = messages
+
+    problems = []
+    invalid = []
+    for entry, interned in zip(animations, pool["animations"]):
+        for (name, animation), indexed in zip(entry.items(), interned.values()):
+            # Each problem once per sign, in the order found
+            sign_problems = {}
+            # The bodies have the same nodes, with the poses replaced by their index in the pool
+            for node, index in zip(walk(animation["body"]), walk(indexed["body"])):
+                speed = node.get("speed")
+                if speed is not None and not (isinstance(speed, (int, float)) and speed > 0):
+                    sign_problems.setdefault(("speed", f"speed {speed} is not positive"))
+                if isinstance(index, int) and index in pose_problems:
+                    sign_problems.update(dict.fromkeys(pose_problems[index]))
+            if compiler.keyframe_count(animation["body"]) == 0:
+                sign_problems.setdefault(("empty", "no keyframes"))
+            for check, message in sign_problems:
+                problems.append({"sign": name, "check": check, "message": message})
+            if sign_problems:
+                invalid.append(name)
+
+    names = Counter(name for entry in animations for name in entry)
+    duplicates = {name for name, count in names.items() if count > 1}
+    for name in sorted(duplicates):
+        problems.append({"sign": name, "check": "collision", "message": f"{names[name]} animations named {name}"})
+    if data is not None:
+        for arms, group in collisions(data).items():
+            problems.append({"sign": arms, "check": "collision", "message": f"{', '.join(group)} have the same animation name"})
+            duplicates.add(arms)
+    invalid.extend(name for name in sorted(duplicates) if name not in invalid)
+
+    return {
+        "signs": sum(names.values()),
+        "invalid": invalid,
+        "problems": problems,
+        "checked": {"poses": stats["poses"], "hands": stats["hands"], "vectors": stats["vectors"]},
+        "duration": time.perf_counter() - start
+    }
+
+def walk(body):
+    """Iterate over the nodes of an IR body and of its REPEAT and SPEED nodes."""
+    for node in body:
+        yield node
+        if isinstance(node, dict) and 'body' in node:
+            yield from walk(node['body'])
+
+def exclude_signs(animations, invalid):
+    """Return the animations without the invalid signs."""
+    invalid = set(invalid)
+    return [entry for entry in animations if not invalid.intersection(entry)]
+
+# ----------------------------------------------------------------
+# VALIDATION PASS
+
+def main_validate(database_file, report_file, output_file=None, hand_poses_dir=HAND_POSES_DIR,
+                  constants_file=CONSTANTS_JSON, data=None, simplify=None):
+    """
+    Validate a compiled database, write the JSON report and the database without the invalid signs.
+
+    Args:
+        database_file (str): Path to database.json, database.ir.json or database.pool.json.
+        report_file (str): Path to the JSON report.
+        output_file (str, optional): Path to the expanded database without the invalid signs. Not written if None.
+        hand_poses_dir (str, optional): Directory of the .blend hand poses. Not checked if None or missing.
+        constants_file (str, optional): Path to the constants.json of the plug-in. Not used if None or missing.
+        data (dict, optional): The database returned by `clean_database`, to check the name collisions.
+        simplify (float, optional): Tolerance of the keyframe simplification of the output, in degrees.
+                                    See `compiler.simplify_poses`. Not simplified if None, or if the
+                                    input is database.json, which the build already simplified.
+
+    Returns:
+        dict: The report.
+    """
+    with open(database_file, 'r') as file:
+        database = json.load(file)
+    animations = ir_animations(database)
+    hand_poses = hand_pose_names(hand_poses_dir) if hand_poses_dir and os.path.isdir(hand_poses_dir) else None
+    scales = load_scales(constants_file) if constants_file and os.path.exists(constants_file) else None
+    report = validate_animations(animations, hand_poses, scales, data)
+    report["database"] = database_file
+    if output_file:
+        with open(output_file, 'w') as file:
+            # The poses of database.json keep their speed (expanding them again would reset it),
+            # and the build already simplified them
+            if is_expanded(database):
+                output = exclude_signs(database, report["invalid"])
+            else:
+                output = compiler.expand_animations(exclude_signs(animations, report["invalid"]))
+                if simplify is not None:
+                    output, _ = compiler.simplify_animations(output, simplify, scales)
+            file.write(compiler.dump_database(output))
+    with open(report_file, 'w') as file:
+        json.dump(report, file, indent=4, ensure_ascii=False)
+    return report
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Validate a compiled animation database before baking it in Blender.")
+    arg_parser.add_argument('database', help="database.json, database.ir.json or database.pool.json")
+    arg_parser.add_argument('report', help="JSON report")
+    arg_parser.add_argument('--output', help="Database without the invalid signs")
+    arg_parser.add_argument('--hand-poses', default=HAND_POSES_DIR, help="Directory of the .blend hand poses")
+    arg_parser.add_argument('--constants', default=CONSTANTS_JSON, help="constants.json of the plug-in")
+    args = arg_parser.parse_args()
+
+    report = main_validate(args.database, args.report, args.output, args.hand_poses, args.constants)
+    for problem in report['problems'][:20]:
+        print(f"{problem['sign']}: {problem['message']}")
+    print(f"{len(report['invalid'])} of {report['signs']} signs invalid ({report['duration']:.3f}s)")
@@ -0,0 +1,145 @@
+# watch.py
+import argparse
+import json
+import os
+import socket
+import time
+
+import compiler
+from build import compile_signs
+from database import clean_database, remove_empty_scripts
+
+POLL_INTERVAL = 0.2  # seconds between two checks of the source
+WATCH_PORT = 52837   # UDP port of the plug-in listener, see GLOBAL_Watch_Database
+
+# ----------------------------------------------------------------
+# WATCHER
+
+class Watcher:
+    """
+    Recompile the animation blocks of a source when it changes, and rewrite the JSON database.
+
+    The source is a database.txt file, or a sheet snapshot written by `source.fetch_rows`
+    (a .json file). The IR of each valid block is kept in memory by content, so an update only
+    compiles the blocks that were added or edited. Invalid blocks are left out of the output.
+    """
+
+    def __init__(self, source_file, output_file, parser=None, notify_port=None):
+        self.source_file = source_file
+        self.output_file = output_file
+        self.parser = parser
+        self.notify_port = notify_port
+        self.blocks = {}
+        self.animations = {}
+        self.mtime = None
+
+    def read_blocks(self):
+        """Return the (key, source) of each block; the key identifies the content of the block."""
+        with open(self.source_file, 'r', encoding='utf-8') as file:
+            content = file.read()
+        if self.source_file.endswith('.json'):
+            data = remove_empty_scripts(clean_database(json.loads(content)["rows"]))
+            signs = [('IDLE', None)] + [(value['arms'], value['script']) for value in data.values()]
+            return [(sign, sign) for sign in signs]
+        return [(text, (text, lineno)) for text, lineno in compiler.split_chunks(content)]
+
+    def block_name(self, key):
+        """Return the sign name of a block key."""
+        if isinstance(key, tuple):
+            return key[0]
+        match = compiler.BLOCK_HEADER.search(key)
+        return match.group('name') if match else None
+
+    def compile_blocks(self, sources):
+        """Compile block sources, return (animations, report) of each block."""
+        if self.source_file.endswith('.json'):
+            return [(animations, chunk_report) for animations, chunk_report, _ in compile_signs(sources, self.parser)]
+        return compiler.compile_chunks(sources, 1, self.parser, ir=True)
+
+    def update(self):
+        """
+        Recompile the source if it was modified since the last update.
+
+        Returns:
+            dict or None: None if the source did not change, else the status {"compiled", "reused",
+                          "changed", "removed", "errors", "duration"}, where changed and removed are sign names
+                          and errors gives the errors of the invalid blocks, with their sign.
+        """
+        mtime = os.stat(self.source_file).st_mtime_ns
+        if mtime == self.mtime:
+            return None
+        self.mtime = mtime
+        start = time.perf_counter()
+        blocks = self.read_blocks()
+        pending = [(key, source) for key, source in blocks if key not in self.blocks]
+        errors = []
+        for (key, _), (animations, chunk_report) in zip(pending, self.compile_blocks([source for _, source in pending])):
+            if animations is None:
+                errors.extend(dict(error, sign=self.block_name(key)) for error in chunk_report["errors"])
+            else:
+                self.blocks[key] = animations
+        # Forget the blocks that are no longer in the source
+        self.blocks = {key: self.blocks[key] for key, _ in blocks if key in self.blocks}
+
+        program = [animation for key, _ in blocks if key in self.blocks for animation in self.blocks[key]]
+        animations = {}
+        for entry in program:
+            for name, animation in entry.items():
+                animations.setdefault(name, animation)
+        changed = [name for name, animation in animations.items() if self.animations.get(name) != animation]
+        removed = [name for name in self.animations if name not in animations]
+        self.animations = animations
+
+        write_atomic(self.output_file, compiler.dump_database(compiler.expand_animations(program)))
+        if self.notify_port and (changed or removed):
+            notify(self.notify_port, {"database": os.path.abspath(self.output_file), "changed": changed, "removed": removed})
+        return {
+            "compiled": len(pending),
+            "reused": len(blocks) - len(pending),
+            "changed": changed,
+            "removed": removed,
+            "errors": errors,
+            "duration": time.perf_counter() - start
+        }
+
+    def run(self, interval=POLL_INTERVAL):
+        """Poll the source until interrupted, and print the result of each update."""
+        print(f"Watching {self.source_file} (Ctrl+C to stop)")
+        try:
+            while True:
+                status = self.update()
+                if status is not None:
+                    for error in status["errors"]:
+                        print(f"{error['sign']} (line {error['line']}): {error['message']}")
+                    print(f"{time.strftime('%H:%M:%S')} {status['compiled']} blocks compiled, {status['reused']} reused "
+                          f"in {status['duration'] * 1000:.0f} ms | changed: {', '.join(status['changed']) or '-'}"
+                          + (f" | removed: {', '.join(status['removed'])}" if status['removed'] else ""))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopped")
+
+def write_atomic(path, content):
+    """Write a file through a temporary file, so the readers never see a partial file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        file.write(content)
+    os.replace(path + '.tmp', path)
+
+def notify(port, message):
+    """Send a message to the plug-in listener on localhost; nothing happens if it is not listening."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        sender.sendto(json.dumps(message).encode('utf-8'), ('127.0.0.1', port))
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Recompile the edited animation blocks when the source changes.")
+    arg_parser.add_argument('source', help="database.txt, or the sheet snapshot (.json)")
+    arg_parser.add_argument('output', help="JSON database")
+    arg_parser.add_argument('--parser', choices=[compiler.PLY, compiler.RD], default=compiler.RD, help="Parser")
+    arg_parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Seconds between two checks")
+    arg_parser.add_argument('--notify', type=int, nargs='?', const=WATCH_PORT, default=None, metavar='PORT',
+                            help=f"Notify the Blender plug-in of the changed signs (default port {WATCH_PORT})")
+    args = arg_parser.parse_args()
+
+    Watcher(args.source, args.output, args.parser, args.notify).run(args.interval)